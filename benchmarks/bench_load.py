@@ -0,0 +1,50 @@
+import sys
+if not '..' in sys.path: sys.path.append('..')
+if not '.' in sys.path: sys.path.append('.')
+import tempfile
+import time as tm
+import numpy as np
+import pandas as pd
+from experiment.data import Data
+from experiment.storage import ColumnFile
+
+
+def fake_scan(n):
+    pos = np.linspace(150, 140, n)
+    t   = (150 - pos) * 2 / 0.299792458
+    X   = 1e-9 * np.exp(-((t - 30) / 1.5)**2) + 1e-12 * np.random.randn(n)
+    return pd.DataFrame({'t': t, 'X': X, 'Y': np.random.randn(n) * 1e-12, 'R': np.nan,
+                         'pos': pos, 'dpos': np.nan, 'ts': np.arange(n) / 256})
+
+
+def time_loads(files, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        t0 = tm.perf_counter()
+        for file in files:
+            np.asarray(Data.read_file(file)['X']).sum()  # Touch the data so mapped pages are read
+        best = min(best, tm.perf_counter() - t0)
+    return best
+
+
+def main(points=20000, files=100, repeat=3):
+    with tempfile.TemporaryDirectory() as folder:
+        dat, bin_ = [], []
+        for i in range(files):
+            data = fake_scan(points)
+            dat.append(f'{folder}/scan{i}.dat')
+            bin_.append(f'{folder}/scan{i}{ColumnFile.EXTENSION}')
+            data.to_csv(dat[-1], sep='\t', index=False)
+            ColumnFile.write(bin_[-1], data, {'start': {'name': 'Start', 'unit': 'mm', 'value': 150}})
+
+        t_dat = time_loads(dat, repeat)
+        t_bin = time_loads(bin_, repeat)
+
+    print(f"Loading {files} scans of {points} points (best of {repeat}):")
+    print(f"  .dat (text): {t_dat:8.3f} s  ({1e3 * t_dat / files:.2f} ms/file)")
+    print(f"  {ColumnFile.EXTENSION} (mmap): {t_bin:8.3f} s  ({1e3 * t_bin / files:.2f} ms/file)")
+    print(f"  speed-up:    {t_dat / t_bin:8.1f}x")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,136 @@
+import sys
+if not '..' in sys.path: sys.path.append('..')
+if not '.' in sys.path: sys.path.append('.')
+import os
+import json
+import argparse
+import tempfile
+import subprocess
+import time as tm
+import matplotlib
+matplotlib.use('Agg')
+from instruments import Lockin, Cernox, SimSR830, SimDMM, SimKBD101, pulse_source
+from experiment import Parameters, Measurement
+
+
+MODES = {
+    'fast':     {'fast': True,  'buffer': False},
+    'buffered': {'fast': True,  'buffer': True},
+    'stepped':  {'fast': False, 'buffer': False},
+}
+
+
+def build(args):
+    lock_in     = Lockin()
+    thermometer = Cernox()
+    delay_line  = SimKBD101(latency=args.stage_latency)
+
+    delay_line.connect()
+    lock_in.connect_resource(SimSR830(noise=1e-12, latency=args.latency, jitter=args.jitter))
+    thermometer.connect_resource(SimDMM(latency=args.latency, latencies={'MEAS:FRES?': args.fres_latency}))
+    lock_in.instr.set_source(pulse_source(delay_line, (args.start + args.end) / 2))
+    lock_in.instr.write(f'OFLT {args.oflt}')
+
+    parameters = Parameters(lock_in)
+    values = {'start': args.start, 'end': args.end, 'vel': args.vel, 'step': args.step,
+              'wait': args.wait, 'ymax': 2, 'fps': args.fps, 'rate': args.rate, 'rper': 1,
+              'cols': args.cols, 'get_R': args.get_R, 'binary': False,
+              'settle': args.settle, 'stable': args.stable}
+    for key, value in values.items():
+        parameters.user.dic[key].set_value(value)
+    for key in ['setup', 'sample', 'obs']:
+        parameters.label.dic[key].set_value('bench')
+    parameters.hidden.tcons.set_value(lock_in.get_tcons())
+    parameters.hidden.slope.set_value(lock_in.get_slope())
+    parameters.hidden.sens.set_value(lock_in.get_sens())
+
+    return Measurement(parameters, lock_in, thermometer, delay_line)
+
+
+def run_mode(measurement, mode):
+    for key, value in MODES[mode].items():
+        measurement.parameters.user.dic[key].set_value(value)
+    instruments = [measurement.lock_in.instr, measurement.thermometer.instr, measurement.delay_line]
+    for instrument in instruments:
+        instrument.reset_busy()
+
+    t0 = tm.perf_counter()
+    measurement.run(interval=.01)
+    total = tm.perf_counter() - t0
+
+    timing    = measurement.parameters.timing
+    durations = measurement.durations
+    points    = int(timing.points.value)
+    io        = {name: instr.busy for name, instr in zip(['lock_in', 'thermometer', 'delay_line'], instruments)}
+    return {'points':        points,
+            'points_per_s':  float(timing.srate.value),
+            'missed_ticks':  int(timing.missed.value),
+            'loop_p50_ms':   float(timing.p50.value),
+            'loop_p99_ms':   float(timing.p99.value),
+            'non_io_ms':     1e3 * (durations['acquire'] - sum(io.values())) / max(points, 1),
+            'io_s':          io,
+            'acquire_s':     durations['acquire'],
+            'plot_s':        durations['plot'],
+            'save_s':        durations['save'],
+            'total_s':       total}
+
+
+def version():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acquisition throughput of the Measurement scan modes on simulated instruments")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--start', type=float, default=150.)
+    parser.add_argument('--end', type=float, default=149.)
+    parser.add_argument('--vel', type=float, default=.5, help="fast scan velocity (mm/s)")
+    parser.add_argument('--rate', type=float, default=50., help="sample rate (Hz)")
+    parser.add_argument('--step', type=float, default=.02, help="stepped scan step (mm)")
+    parser.add_argument('--wait', type=float, default=3., help="stepped scan wait (tcons)")
+    parser.add_argument('--settle', action='store_true', help="stepped scan waits the filter slope settling time")
+    parser.add_argument('--stable', action='store_true', help="stepped scan reads until stable")
+    parser.add_argument('--oflt', type=int, default=5, help="lock-in time constant index")
+    parser.add_argument('--fps', type=float, default=20., help="live plot frame rate cap (Hz)")
+    parser.add_argument('--cols', default='X,Y', help="lock-in outputs recorded per point")
+    parser.add_argument('--get_R', action='store_true')
+    parser.add_argument('--latency', type=float, default=.005, help="VISA query latency (s)")
+    parser.add_argument('--fres_latency', type=float, default=.25, help="MEAS:FRES? latency (s)")
+    parser.add_argument('--stage_latency', type=float, default=.001, help="delay line call latency (s)")
+    parser.add_argument('--jitter', type=float, default=0., help="mean extra exponential latency (s)")
+    parser.add_argument('--json', default=None, help="results file (default benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = {'version': version(), 'date': tm.strftime('%Y-%m-%d %H:%M:%S'), 'config': vars(args), 'modes': {}}
+    folder  = os.path.dirname(os.path.abspath(__file__))
+    output  = args.json or f"{folder}/results/{tm.strftime('%Y%m%d-%H%M%S')}.json"
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # Measurement writes its output folders in the working directory
+        try:
+            measurement = build(args)
+            for mode in args.modes:
+                results['modes'][mode] = run_mode(measurement, mode)
+        finally:
+            os.chdir(cwd)
+
+    print(f"\n{'mode':>10} {'points':>7} {'pts/s':>8} {'missed':>7} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'non-io ms':>9} {'io s':>7} {'plot s':>7} {'save s':>7} {'total s':>8}")
+    for mode, r in results['modes'].items():
+        print(f"{mode:>10} {r['points']:>7} {r['points_per_s']:>8.1f} {r['missed_ticks']:>7} "
+              f"{r['loop_p50_ms']:>8.2f} {r['loop_p99_ms']:>8.2f} {r['non_io_ms']:>9.2f} "
+              f"{sum(r['io_s'].values()):>7.2f} {r['plot_s']:>7.2f} {r['save_s']:>7.2f} {r['total_s']:>8.2f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"\nSaved results to {output}")
+
+
+if __name__ == '__main__':
+    main()
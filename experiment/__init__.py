@@ -1,5 +1,6 @@
 from .parameters import Parameters
 from .liveplot import LivePlot
 from .measurement import Measurement
-from .data import Data
+from .data import Data, DataSet
+from .processing import LockinFilter, Deconvolution
 
@@ -0,0 +1,244 @@
+import threading
+import time as tm
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Poller:
+    """ Calls func every period seconds in a background thread and holds its last value """
+    def __init__(self, func, period):
+        self._func   = func
+        self._period = period
+        self._value  = np.nan
+        self._time   = np.nan
+        self._thread = None
+        self._stop   = threading.Event()
+
+    @property
+    def value(self): return self._value
+    @property
+    def time(self): return self._time
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            t0 = tm.perf_counter()
+            try:
+                self._value = self._func()
+                self._time  = t0
+            except Exception as error:
+                print(f"Poller failed to read: {error}")
+            self._stop.wait(max(self._period - (tm.perf_counter() - t0), 0))
+
+
+class PointReader:
+    """ Reads the delay line position and the lock-in concurrently, so each point costs the
+    slowest of the two reads instead of their sum. All lock-in channels come from one SNAP? query.
+    The thermometer runs in its own Poller at a lower rate and its last value is held onto every
+    point """
+    def __init__(self, delay_line, lock_in, thermometer, channels=('X',), get_R=False, R_period=1.):
+        self._delay_line = delay_line
+        self._lock_in    = lock_in
+        self._channels   = tuple(channels)
+        self._time       = np.nan
+        self._pool       = ThreadPoolExecutor(max_workers=1)
+        self._thermo     = Poller(thermometer.get_fres, R_period) if get_R else None
+
+    @property
+    def time(self):
+        """ Host time (time.perf_counter) of the last lock-in read, midpoint of the query """
+        return self._time
+
+    def __enter__(self):
+        if self._thermo: self._thermo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._thermo: self._thermo.stop()
+        self._pool.shutdown()
+
+    def _read_lock_in(self):
+        if self._channels == ('X',): return (self._lock_in.get_X(),)
+        return self._lock_in.snap(*self._channels)
+
+    def read(self):
+        """ Returns the position, the lock-in values in the order of channels and R """
+        pos    = self._pool.submit(self._delay_line.get_pos)
+        t0     = tm.perf_counter()
+        values = self._read_lock_in()
+        self._time = (t0 + tm.perf_counter()) / 2
+        R      = self._thermo.value if self._thermo else np.nan
+        return pos.result(), values, R
+
+
+class PositionTracker:
+    """ Reads the delay line position every period seconds in a background thread and keeps a
+    host timestamped track of it. get_pos only changes on the device polling ticks, so each new
+    value is stamped halfway between the read that still returned the old value and the read
+    that returned the new one, which places the tick within period / 2 instead of a whole
+    polling interval. position(t) interpolates the track at host times (time.perf_counter) and
+    get_pos returns the latest value, so the tracker can stand in for the delay line """
+    def __init__(self, delay_line, period=.002, linger=.05):
+        self._delay_line = delay_line
+        self._period     = period
+        self._linger     = linger
+        self._track      = []  # (time, position) of every new polled value
+        self._thread     = None
+        self._stop       = threading.Event()
+
+    @property
+    def track(self): return np.array(self._track).reshape(-1, 2)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop(self._linger)
+
+    def start(self):
+        self._track = [self._read()]
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, linger=0.):
+        """ Keeps tracking for linger seconds so that the last samples are bracketed by the track """
+        self._stop.wait(linger)
+        self._stop.set()
+        if self._thread: self._thread.join()
+
+    def _read(self):
+        t0  = tm.perf_counter()
+        pos = self._delay_line.get_pos()
+        return (t0 + tm.perf_counter()) / 2, pos
+
+    def _loop(self):
+        previous = self._track[-1][0]
+        while not self._stop.is_set():
+            try:
+                now, pos = self._read()
+                if pos != self._track[-1][1]:
+                    self._track.append(((previous + now) / 2, pos))
+                previous = now
+            except Exception as error:
+                print(f"Position tracker failed to read: {error}")
+            self._stop.wait(self._period)
+
+    def get_pos(self):
+        return self._track[-1][1]
+
+    def position(self, t):
+        track = self.track
+        return np.interp(t, track[:, 0], track[:, 1])
+
+
+class SampleClock:
+    """ Paces a loop at rate (Hz) on time.perf_counter. Ticks sit on an absolute grid so timing
+    errors do not accumulate, and an overrun skips to the next tick and counts the missed ones.
+    Without a rate it only timestamps the loop """
+    def __init__(self, rate=None):
+        self._dt      = 1 / rate if rate else 0
+        self._t0      = None
+        self._last    = None
+        self._tick    = 0
+        self._count   = 0
+        self._missed  = 0
+        self._latency = []  # Loop time between consecutive waits (s)
+
+    @property
+    def missed(self): return self._missed
+    @property
+    def t0(self): return self._t0
+
+    def start(self):
+        self._t0      = tm.perf_counter()
+        self._last    = None
+        self._tick    = 0
+        self._count   = 0
+        self._missed  = 0
+        self._latency = []
+
+    def now(self):
+        return tm.perf_counter() - self._t0
+
+    def wait(self):
+        """ Sleeps until the next tick and returns its timestamp in s since start """
+        now = tm.perf_counter()
+        if self._last is not None: self._latency.append(now - self._last)
+
+        if self._dt:
+            self._tick += 1
+            late = int((now - self._t0) / self._dt) + 1 - self._tick  # Ticks already gone by
+            if late > 0:
+                self._tick   += late
+                self._missed += late
+            tm.sleep(max(self._t0 + self._tick * self._dt - tm.perf_counter(), 0))
+
+        self._last   = tm.perf_counter()
+        self._count += 1
+        return self._last - self._t0
+
+    def stats(self):
+        latency = np.array(self._latency) * 1e3  # ms
+        elapsed = self._last - self._t0 if self._last else np.nan
+        return {'points': self._count,
+                'missed': self._missed,
+                'rate'  : self._count / elapsed if elapsed else np.nan,
+                'p50'   : np.percentile(latency, 50) if len(latency) else np.nan,
+                'p99'   : np.percentile(latency, 99) if len(latency) else np.nan}
+
+
+class AdaptiveGrid:
+    """ Point selection of an adaptive stepped scan on the grid of a uniform scan from start to
+    end by step, addressed by index. coarse() gives every coarse-th point, then each refine()
+    round gives the midpoints of the intervals whose signal change plus mean amplitude is at
+    least threshold times the largest one of the coarse pass, until they are one step wide """
+    def __init__(self, start, end, step, coarse=5, threshold=.05):
+        self._start     = start
+        self._step      = step if end > start else -step
+        self._size      = len(np.arange(start, end, self._step))
+        self._coarse    = max(int(coarse), 1)
+        self._threshold = threshold
+        self._reference = None
+        self._values    = {}  # index -> signal
+
+    @property
+    def size(self): return self._size
+    @property
+    def refining(self): return self._reference is not None
+
+    def position(self, index):
+        return self._start + index * self._step
+
+    def add(self, index, value):
+        self._values[index] = value
+
+    def coarse(self):
+        return sorted(set(range(0, self._size, self._coarse)) | {self._size - 1})
+
+    def _scores(self):
+        indexes = sorted(self._values)
+        values  = np.abs(np.array([self._values[i] for i in indexes]))
+        change  = np.abs(np.diff([self._values[i] for i in indexes]))
+        return indexes, change + (values[:-1] + values[1:]) / 2
+
+    def refine(self):
+        indexes, scores = self._scores()
+        if not len(scores): return []
+        if self._reference is None: self._reference = scores.max()
+
+        threshold = self._threshold * self._reference
+        return [(a + b) // 2 for a, b, score in zip(indexes[:-1], indexes[1:], scores)
+                if b - a > 1 and score >= threshold and score > 0]
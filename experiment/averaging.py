@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class ScanAverage:
+    """ Point by point mean and variance of repeated scans, updated online with Welford's
+    algorithm so that memory does not grow with the number of scans. Every scan is interpolated
+    onto the positions of the first one, points outside a scan are left out of its statistics """
+    STD_COLUMNS = ['X', 'Y']  # Columns that also get their standard deviation in the table
+
+    def __init__(self, columns):
+        self._columns = list(columns)  # Averaged columns, the others are taken from the first scan
+        self._grid    = None
+        self._count   = None
+        self._mean    = None
+        self._m2      = None
+        self._scans   = 0
+
+    @property
+    def scans(self): return self._scans
+    @property
+    def mean(self): return self._mean
+    @property
+    def var(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self._count > 1, self._m2 / (self._count - 1), np.nan)
+
+    def _values(self, data):
+        if self._grid is None:
+            return data[self._columns].to_numpy(dtype=float)
+        pos   = data['pos'].to_numpy(dtype=float)
+        order = np.argsort(pos)
+        return np.column_stack([np.interp(self._grid['pos'], pos[order], data[col].to_numpy(dtype=float)[order],
+                                          left=np.nan, right=np.nan) for col in self._columns])
+
+    def add(self, data):
+        values = self._values(data)
+        if self._grid is None:
+            self._grid  = data.copy()
+            self._count = np.zeros(values.shape)
+            self._mean  = np.zeros(values.shape)
+            self._m2    = np.zeros(values.shape)
+
+        valid = np.isfinite(values)
+        self._count += valid
+        delta = np.where(valid, values - self._mean, 0)
+        self._mean  += np.where(valid, delta / np.maximum(self._count, 1), 0)
+        self._m2    += np.where(valid, delta * (values - self._mean), 0)
+        self._scans += 1
+
+    def table(self):
+        """ First scan with its averaged columns replaced by the mean, plus the standard deviation
+        of the STD_COLUMNS and the number n of scans averaged on each point """
+        table = self._grid.copy()
+        mean  = np.where(self._count > 0, self._mean, np.nan)
+        std   = np.sqrt(self.var)
+        for j, col in enumerate(self._columns):
+            table[col] = mean[:, j]
+            if col in self.STD_COLUMNS: table[f'{col}std'] = std[:, j]
+        table['n'] = self._count[:, self._columns.index('X')].astype(int)
+        return table
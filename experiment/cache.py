@@ -0,0 +1,84 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+
+
+class ResultCache:
+    """ Cache of processed scan results (a tuple of DataFrames) keyed on the data file content
+    hash and the processing parameters. Recent results are kept in an in-memory LRU of max_items
+    entries, and every result is also stored in folder, whose size is kept under max_bytes by
+    evicting the least recently used files """
+    FOLDER = './cache'
+
+    def __init__(self, folder=FOLDER, max_items=32, max_bytes=256 * 2**20):
+        self._folder    = folder
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._memory    = OrderedDict()
+        self._hashes    = {}  # (path, mtime, size) -> content hash
+
+    @property
+    def folder(self): return self._folder
+
+    def file_hash(self, file):
+        stat = os.stat(file)
+        id_  = (os.path.abspath(file), stat.st_mtime_ns, stat.st_size)
+        if id_ not in self._hashes:
+            sha = hashlib.sha1()
+            with open(file, 'rb') as f:
+                for block in iter(lambda: f.read(2**20), b''):
+                    sha.update(block)
+            self._hashes[id_] = sha.hexdigest()
+        return self._hashes[id_]
+
+    def key(self, file, *params):
+        return hashlib.sha1(f"{self.file_hash(file)}{params}".encode()).hexdigest()
+
+    def get(self, key):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return tuple(df.copy() for df in self._memory[key])
+
+        path = self._path(key)
+        if os.path.exists(path):
+            os.utime(path)  # Mark as recently used
+            with np.load(path) as file:
+                count   = int(file['count'])
+                results = tuple(pd.DataFrame({col.split('/', 1)[1]: file[col] for col in file.files
+                                              if col.startswith(f'{i}/')}) for i in range(count))
+            self._remember(key, results)
+            return tuple(df.copy() for df in results)
+        return None
+
+    def put(self, key, *results):
+        self._remember(key, tuple(df.copy() for df in results))
+
+        if not os.path.exists(self._folder): os.makedirs(self._folder)
+        arrays = {f'{i}/{col}': df[col].values for i, df in enumerate(results) for col in df}
+        np.savez(self._path(key), count=len(results), **arrays)
+        self._evict_files()
+
+    def clear(self):
+        self._memory.clear()
+        if os.path.exists(self._folder):
+            for file in os.listdir(self._folder):
+                if file.endswith('.npz'): os.remove(f'{self._folder}/{file}')
+
+    def _path(self, key):
+        return f'{self._folder}/{key}.npz'
+
+    def _remember(self, key, results):
+        self._memory[key] = results
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_items:
+            self._memory.popitem(last=False)
+
+    def _evict_files(self):
+        files = [f'{self._folder}/{file}' for file in os.listdir(self._folder) if file.endswith('.npz')]
+        files.sort(key=os.path.getmtime)
+        total = sum(os.path.getsize(file) for file in files)
+        while files and total > self._max_bytes:
+            total -= os.path.getsize(files[0])
+            os.remove(files.pop(0))
@@ -1,32 +1,96 @@
 import numpy as np
 import pandas as pd
-from scipy.fft import fft, fftfreq
+from glob import glob
+from concurrent.futures import ThreadPoolExecutor
+from scipy.fft import rfft, rfftfreq, next_fast_len
+from scipy.signal import get_window
+from experiment.storage import ColumnFile
+from experiment.cache import ResultCache
 
 
 class Data:
-    def __init__(self, file, dt, max_=None, pow_=None):
-        self._file = file
-        self._dt   = dt
-        self._max  = max_
-        self._pow  = pow_
-        self._raw_data = self.read_file(file)
-        self._time_dom = self.interp_data(self._raw_data, dt, max_=max_, pow_=pow_)
-        self._freq_dom = self.compute_fft(self._time_dom, dt)
+    CACHE = ResultCache()  # Shared cache of processed results, set to None to disable
+
+    TIME_PARAMS = ['dt', 'max_', 'pow_', 'deconv']
+    FFT_PARAMS  = ['pad', 'window', 'workers']
+
+    SPECTRUM_DTYPE = [('freq', 'f8'), ('ampl', 'f8'), ('phase', 'f8'), ('fft', 'c16')]
+
+    def __init__(self, file, dt, max_=None, pow_=None, pad=None, window=None, workers=None, deconv=None):
+        """ Nothing is read or computed until raw, time_dom or freq_dom is first accessed.
+        pad, window and workers are passed to compute_fft. deconv is an optional Deconvolution
+        applied to the interpolated time domain, e.g. Deconvolution.from_info of the scan """
+        self._file    = file
+        self._dt      = dt
+        self._max     = max_
+        self._pow     = pow_
+        self._pad     = pad
+        self._window  = window
+        self._workers = workers
+        self._deconv  = deconv
+        self._raw_data = None
+        self._time_dom = None
+        self._spectrum = None
 
     def __repr__(self):
         return f"Data from {self.file}, cut @ t={self._max} and interpolated to 2^{self._pow} points with dt={self._dt}"
 
     @property
     def file(self): return self._file
+
     @property
-    def raw(self): return self._raw_data
+    def raw(self):
+        if self._raw_data is None:
+            self._raw_data = self.read_file(self._file)
+        return self._raw_data
+
     @property
-    def time_dom(self): return self._time_dom
+    def time_dom(self):
+        if self._time_dom is None:
+            if not self._load_cached():
+                self._time_dom = self.interp_data(self.raw, self._dt, max_=self._max, pow_=self._pow)
+                if self._deconv: self._time_dom['E'] = self._deconv.apply(self._time_dom['E'], self._dt)
+        return self._time_dom
+
     @property
-    def freq_dom(self): return self._freq_dom
+    def spectrum(self):
+        """ Frequency domain as a structured array (fields freq, ampl, phase and fft) """
+        if self._spectrum is None:
+            if not self._load_cached():
+                self._spectrum = self.compute_fft(self.time_dom, self._dt, pad=self._pad, window=self._window,
+                                                  workers=self._workers, as_frame=False)
+                if self.CACHE: self.CACHE.put(self._cache_key(), self._time_dom, pd.DataFrame(self._spectrum))
+        return self._spectrum
+
+    @property
+    def freq_dom(self): return pd.DataFrame(self.spectrum)
+
+    def set_params(self, **params):
+        """ Changes any of dt, max_, pow_, deconv (dropping the time and frequency domains) or pad,
+        window, workers (dropping only the frequency domain). The raw data is kept """
+        for name, value in params.items():
+            if name not in self.TIME_PARAMS + self.FFT_PARAMS:
+                raise TypeError(f"set_params() got an unexpected parameter '{name}'")
+            setattr(self, f"_{name.rstrip('_')}", value)
+        if any(name in self.TIME_PARAMS for name in params):
+            self._time_dom = None
+        self._spectrum = None
+
+    def _cache_key(self):
+        return self.CACHE.key(self._file, self._dt, self._max, self._pow, self._pad, self._window, self._deconv)
+
+    def _load_cached(self):
+        cached = self.CACHE.get(self._cache_key()) if self.CACHE else None
+        if cached:
+            self._time_dom = cached[0]
+            self._spectrum = np.array(cached[1].to_records(index=False), dtype=self.SPECTRUM_DTYPE)
+        return bool(cached)
 
     @staticmethod
     def read_file(file):
+        """ Reads tab-separated .dat files, or memory maps binary column files """
+        if ColumnFile.is_column_file(file):
+            return ColumnFile.read(file)[0]
         return pd.read_table(file)
 
     @staticmethod
@@ -40,14 +104,97 @@ class Data:
         return pd.DataFrame({'t': t, 'E': E})
 
     @staticmethod
-    def compute_fft(data, dt):
-        t = data['t'].values
-        E = data['E'].values
-        N = len(t)
-        Efft  = np.conj(fft(E)[:N//2])
-        ampl  = (2/N) * np.abs(Efft)
-        phase = np.angle(Efft)
-        freq  = fftfreq(N, dt)[:N//2]
-        return pd.DataFrame({'freq': freq, 'ampl': ampl, 'phase': phase, 'fft': Efft})
-    
-    
\ No newline at end of file
+    def compute_fft(data, dt, pad=None, window=None, workers=None, as_frame=True):
+        """ Real FFT of the time domain E. pad zero pads the trace to the next fast length
+        ('fast'), the next power of two ('pow2') or a given number of points. window is any
+        scipy.signal.get_window name, amplitudes are corrected by its coherent gain. Returns a
+        DataFrame, or a structured array if as_frame is False """
+        E = np.asarray(data['E'], dtype=float)
+        N = len(E)
+        if window:
+            w = get_window(window, N)
+            E = E * w
+            gain = w.sum()
+        else:
+            gain = N
+
+        if pad == 'fast':   M = next_fast_len(N, real=True)
+        elif pad == 'pow2': M = 2**int(np.ceil(np.log2(N)))
+        elif pad:           M = max(int(pad), N)
+        else:               M = N
+
+        spectrum = np.empty(M//2, dtype=Data.SPECTRUM_DTYPE)
+        spectrum['fft']   = np.conj(rfft(E, M, workers=workers)[:M//2])
+        spectrum['ampl']  = (2/gain) * np.abs(spectrum['fft'])
+        spectrum['phase'] = np.angle(spectrum['fft'])
+        spectrum['freq']  = rfftfreq(M, dt)[:M//2]
+        return pd.DataFrame(spectrum) if as_frame else spectrum
+
+
+class DataSet:
+    """ Many scans (a list of files or a glob pattern) read in parallel, interpolated onto one
+    shared time grid as a 2-D array (one row per scan) and transformed in one rfft call """
+    def __init__(self, files, dt, max_=None, pow_=None, workers=None):
+        self._files   = sorted(glob(files)) if isinstance(files, str) else list(files)
+        self._dt      = dt
+        self._max     = max_
+        self._pow     = pow_
+        self._workers = workers
+
+        with ThreadPoolExecutor(workers) as pool:
+            self._raw_data = list(pool.map(Data.read_file, self._files))
+        self._t, self._E = self.interp_data(self._raw_data, dt, max_=max_, pow_=pow_)
+        self._freq, self._fft = self.compute_fft(self._E, dt, workers=workers or -1)
+
+    def __repr__(self):
+        return f"DataSet of {len(self.files)} files, cut @ t={self._max} and interpolated to 2^{self._pow} points with dt={self._dt}"
+
+    def __len__(self):
+        return len(self._files)
+
+    @property
+    def files(self): return self._files
+    @property
+    def raw(self): return self._raw_data
+    @property
+    def t(self): return self._t
+    @property
+    def E(self): return self._E
+    @property
+    def freq(self): return self._freq
+    @property
+    def fft(self): return self._fft
+    @property
+    def ampl(self): return (2/len(self._t)) * np.abs(self._fft)
+
+    @property
+    def time_dom(self):
+        return pd.DataFrame({'t': self._t, 'E': self._E.mean(axis=0), 'std': self._E.std(axis=0)})
+
+    @property
+    def freq_dom(self):
+        """ Spectrum of the mean trace, with the spread of the individual scan amplitudes """
+        Efft = self._fft.mean(axis=0)
+        ampl = (2/len(self._t)) * np.abs(Efft)
+        return pd.DataFrame({'freq': self._freq, 'ampl': ampl, 'std': self.ampl.std(axis=0),
+                             'phase': np.angle(Efft), 'fft': Efft})
+
+    @staticmethod
+    def interp_data(raw_data, dt, max_=None, pow_=None):
+        """ Same cut and grid rules as Data.interp_data, on a grid shared by all scans """
+        dcuts = [raw.loc[raw['t'] <= max_] if max_ else raw for raw in raw_data]
+        tmin  = max(min(dcut['t']) for dcut in dcuts)
+        tmax  = tmin + (dt * 2**pow_) if pow_ else max(max(dcut['t']) for dcut in dcuts)
+
+        t = np.arange(tmin, tmax, dt)
+        E = np.empty((len(dcuts), len(t)))
+        for i, dcut in enumerate(dcuts):
+            E[i] = np.interp(t, dcut['t'], dcut['X'], right=0) * 1e9  # Convert A to nA
+        return t, E
+
+    @staticmethod
+    def compute_fft(E, dt, workers=-1):
+        N    = E.shape[1]
+        Efft = np.conj(rfft(E, axis=1, workers=workers)[:, :N//2])
+        freq = rfftfreq(N, dt)[:N//2]
+        return freq, Efft
@@ -1,38 +1,129 @@
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+import time as tm
+from experiment.data import Data
 
 
 class LivePlot:
-    def __init__(self, start, end, ymin, ymax):
+    """ Live trace of a scan. Appended points are binned per screen pixel column into a min/max
+    envelope, so once the trace is longer than the axes are wide a redraw costs the same for any
+    number of points. The line is blitted over a cached background at most fps times per second.
+    With spectrum, a second axes below the trace is left for a LiveSpectrum """
+    def __init__(self, start, end, ymin, ymax, sort=False, fps=20, spectrum=False):
         self._start = start
         self._end   = end
         self._ymin  = ymin
         self._ymax  = ymax
+        self._sort  = sort  # Points may come in any order, e.g. adaptive scans
+        self._fps   = fps
+        self._spec  = spectrum
         self._fig   = None
         self._ax    = None
+        self._spectrum_ax = None
         self._line  = None
+        self._x     = np.empty(1024)
+        self._y     = np.empty(1024)
+        self._n     = 0
+        self._width = 0     # Axes width in pixels, one envelope bin each
+        self._lo    = None  # Envelope minimum per bin
+        self._hi    = None  # Envelope maximum per bin
+        self._background = None
+        self._last  = -np.inf
         self._create()
 
     @property
     def fig(self): return self._fig
+    @property
+    def spectrum_ax(self): return self._spectrum_ax
+    @property
+    def x(self): return self._x[:self._n]
+    @property
+    def y(self): return self._y[:self._n]
 
     def _create(self):
         plt.close('all')
         self._fig   = plt.figure('live_plot', figsize=[9, 7])
-        self._ax    = self._fig.add_subplot(111)
-        self._line, = self._ax.plot(np.nan, np.nan)
-        plt.show(block=False)
-        self._fig.canvas.draw()
+        if self._spec:
+            self._ax, self._spectrum_ax = self._fig.subplots(2, 1, height_ratios=[3, 2])
+        else:
+            self._ax = self._fig.add_subplot(111)
+        self._line, = self._ax.plot(np.nan, np.nan, animated=True)
         self._ax.set_xlim([self._start, self._end])
         self._ax.set_ylim([self._ymin, self._ymax])
         plt.tight_layout()
+        self._fig.canvas.mpl_connect('draw_event', self._on_draw)
+        plt.show(block=False)
+        self._fig.canvas.draw()
 
-    def update(self, x_data, y_data):
-        self._line.set_xdata(x_data)
-        self._line.set_ydata(y_data)
-        self._ax.draw_artist(self._ax.patch)
+    def _on_draw(self, event):
+        """ Caches the background of every full redraw, e.g. after a resize, and rebins the envelope
+        if the axes width changed """
+        self._background = self._fig.canvas.copy_from_bbox(self._ax.bbox)
+        width = max(int(self._ax.bbox.width), 1)
+        if width != self._width:
+            self._width = width
+            self._lo    = np.full(width, np.inf)
+            self._hi    = np.full(width, -np.inf)
+            self._bin(self.x, self.y)
         self._ax.draw_artist(self._line)
-        self._fig.canvas.update()
+
+    def _bin(self, x, y):
+        keep = np.isfinite(x) & np.isfinite(y)
+        x, y = x[keep], y[keep]
+        bins = ((x - self._start) / (self._end - self._start) * self._width).astype(int)
+        bins = np.clip(bins, 0, self._width - 1)
+        np.minimum.at(self._lo, bins, y)
+        np.maximum.at(self._hi, bins, y)
+
+    def append(self, x_data, y_data):
+        x_data = np.atleast_1d(np.asarray(x_data, dtype=float))
+        y_data = np.atleast_1d(np.asarray(y_data, dtype=float))
+        n = self._n + len(x_data)
+        if n > len(self._x):  # Grow by doubling so appends stay amortized O(1)
+            size    = max(2 * len(self._x), n)
+            self._x = np.concatenate([self._x[:self._n], np.empty(size - self._n)])
+            self._y = np.concatenate([self._y[:self._n], np.empty(size - self._n)])
+        self._x[self._n:n] = x_data
+        self._y[self._n:n] = y_data
+        self._n = n
+        if self._width: self._bin(x_data, y_data)
+
+    def _line_data(self):
+        """ The points themselves while they fit in two per pixel, else the min/max envelope """
+        if self._n <= 2 * self._width:
+            order = np.argsort(self.x) if self._sort else slice(None)
+            return self.x[order], self.y[order]
+        bins = np.flatnonzero(np.isfinite(self._lo))
+        x    = self._start + (bins + .5) / self._width * (self._end - self._start)
+        return np.repeat(x, 2), np.column_stack([self._lo[bins], self._hi[bins]]).ravel()
+
+    def update(self, x_data=None, y_data=None, force=False):
+        """ Redraws the line with the given data, or with the appended points if none is given.
+        Returns whether it was drawn, redraws closer than 1 / fps s apart are skipped unless forced """
+        if x_data is not None:
+            self._n = 0
+            if self._width: self._lo[:], self._hi[:] = np.inf, -np.inf
+            self.append(x_data, y_data)
+            force = True
+
+        now = tm.perf_counter()
+        if not force and now - self._last < 1 / self._fps: return False
+        self._last = now
+
+        self._line.set_data(*self._line_data())
+        if self._background is None:
+            self._fig.canvas.draw()
+        else:
+            self._fig.canvas.restore_region(self._background)
+            self._ax.draw_artist(self._line)
+            self._fig.canvas.blit(self._ax.bbox)
+        self._fig.canvas.flush_events()
+        return True
+
+    def redraw(self):
+        """ Full redraw, e.g. after the spectrum changed, which also caches the new background """
+        self._fig.canvas.draw()
         self._fig.canvas.flush_events()
 
     def final(self, x_data, y_data):
@@ -43,3 +134,69 @@ class LivePlot:
         self._ax.set_xlim([self._start, self._end])
         self._fig.show()
         plt.tight_layout()
+
+
+class LiveSpectrum:
+    """ Amplitude spectrum of the growing trace of a scan, recomputed with Data.interp_data and
+    Data.compute_fft at most once every period seconds, and the running average of the spectra
+    of the finished scans. The time step is the median spacing of the trace unless dt is given """
+    def __init__(self, ax, dt=None, period=1., window='hann'):
+        self._ax       = ax
+        self._dt       = dt
+        self._period   = period
+        self._window   = window
+        self._last     = -np.inf
+        self._spectrum = None  # Last spectrum of the current scan
+        self._freq     = None  # Frequency grid of the average
+        self._sum      = None
+        self._count    = 0
+        self._line,    = ax.semilogy([], [], label='Scan')
+        self._mean,    = ax.semilogy([], [], label='Average')
+        ax.set_xlabel('Frequency (THz)')
+        ax.set_ylabel('Amplitude (nA)')
+        ax.legend(loc='upper right')
+        ax.figure.tight_layout()
+        ax.figure.canvas.draw()
+
+    @property
+    def count(self): return self._count
+    @property
+    def spectrum(self): return self._spectrum
+
+    def update(self, t, X, force=False):
+        """ Recomputes the spectrum of the trace X(t) (ps, A) unless the last one is more recent than
+        period, or the trace too short. Returns whether the spectrum changed """
+        now = tm.perf_counter()
+        if not force and now - self._last < self._period: return False
+
+        keep  = np.isfinite(t) & np.isfinite(X)
+        order = np.argsort(t[keep])
+        t, X  = t[keep][order], X[keep][order]
+        steps = np.diff(t)
+        if len(t) < 8 or not np.any(steps > 0): return False
+        self._last = now
+
+        dt   = self._dt or np.median(steps[steps > 0])
+        data = Data.interp_data(pd.DataFrame({'t': t, 'X': X}), dt)
+        self._spectrum = Data.compute_fft(data, dt, pad='fast', window=self._window, as_frame=False)
+        self._line.set_data(self._spectrum['freq'], self._spectrum['ampl'])
+        self._rescale()
+        return True
+
+    def end_scan(self):
+        """ Adds the spectrum of the finished scan to the running average """
+        if self._spectrum is None: return
+        if self._freq is None:
+            self._freq = self._spectrum['freq']
+            self._sum  = np.zeros(len(self._freq))
+        self._sum   += np.interp(self._freq, self._spectrum['freq'], self._spectrum['ampl'], right=0)
+        self._count += 1
+        self._spectrum = None
+        self._mean.set_data(self._freq, self._sum / self._count)
+        self._mean.set_label(f'Average of {self._count}')
+        self._ax.legend(loc='upper right')
+        self._rescale()
+
+    def _rescale(self):
+        self._ax.relim()
+        self._ax.autoscale_view()
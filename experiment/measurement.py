@@ -1,10 +1,17 @@
 import os
+import threading
+import contextlib
 import time as tm
 import numpy as np
 import pandas as pd
 import tkinter as tk
 from tkinter import ttk
-from experiment import LivePlot
+from experiment.liveplot import LivePlot, LiveSpectrum
+from experiment.ringbuffer import RingBuffer
+from experiment.acquisition import PointReader, PositionTracker, SampleClock, AdaptiveGrid
+from experiment.storage import StreamWriter, ColumnFile
+from experiment.averaging import ScanAverage
+from instruments.trajectory import Trajectory, ScanPlan
 
 
 class Constants:
@@ -26,12 +33,40 @@ class Measurement:
     INFO_FOLDER = './output/info'
     PLOT_FOLDER = './output/plot'
 
+    BUFFER_CAPACITY = 2**16
+    RUN_UP          = .05  # s at constant velocity before start, covers the move command latency
+    ADAPT_COARSE    = 5    # Steps between the points of the adaptive coarse pass
+    ADAPT_THRESHOLD = .05  # Refined intervals score at least this fraction of the coarse maximum
+    MOVE_POLL       = .005 # s between delay line status reads while stepping
+    MOVE_TIMEOUT    = 60   # s a move may overrun its trajectory, as the blocking delay line moves
+    STABLE_TOL      = 1e-3 # Read stable tolerance between consecutive reads, fraction of the sensitivity
+
+    COLUMNS = ['t', 'X', 'Y', 'R', 'pos', 'dpos', 'ts']
+    RENAME  = {'R': 'Rlock'}  # Lock-in outputs whose column name would clash with the thermometer R
+
     def __init__(self, parameters, lock_in, thermometer, delay_line):
         self._parameters  = parameters
         self._lock_in     = lock_in
         self._thermometer = thermometer
         self._delay_line  = delay_line
         self._widget      = None
+        self._plot        = None
+        self._spectrum    = None
+        self._start       = None
+        self._scan_from   = 0  # First live plot point of the current scan
+        self._repeat      = 1
+        self._chunks      = False
+        self._pending     = 0
+        self._data        = None
+        self._name        = None
+        self._settings    = None  # Parameters the running scan was started with
+        self._writer      = None
+        self._thread      = None
+        self._channels    = ['X']
+        self._columns     = self.COLUMNS
+        self._durations   = {}
+        self._stop        = threading.Event()
+        self._buffer      = RingBuffer(self.BUFFER_CAPACITY, 2)  # (pos, X) samples for the live plot
 
         self._check_output_folder()
 
@@ -45,6 +80,10 @@ class Measurement:
     def delay_line(self): return self._delay_line
     @property
     def widget(self): return self._widget
+    @property
+    def is_running(self): return self._thread is not None and self._thread.is_alive()
+    @property
+    def durations(self): return self._durations
 
     def _check_output_folder(self):
         folders = [self.DATA_FOLDER, self.INFO_FOLDER, self.PLOT_FOLDER]
@@ -56,109 +95,462 @@ class Measurement:
         self._widget = MeasurementWidget(frame, self)
         print("Measurement widget successfully created")
 
-    def _get_point(self, get_Y=False, get_R=False):
-        X, Y = self.lock_in.get_XY() if get_Y else (self.lock_in.get_X(), np.nan)
-        R = self.thermometer.get_fres() if get_R else np.nan
-        return X, Y, R
-        
+    def _point_reader(self, delay_line, get_R=False, R_period=1.):
+        return PointReader(delay_line, self.lock_in, self.thermometer, self._channels, get_R, R_period)
+
+    def _position_source(self, sync):
+        """ A PositionTracker of the delay line when synchronizing positions to the lock-in reads,
+        else the delay line itself """
+        return PositionTracker(self.delay_line) if sync else contextlib.nullcontext(self.delay_line)
+
+    def _set_channels(self, cols):
+        """ Lock-in outputs recorded on every point from a comma separated list of SNAP_LIST names.
+        X is always recorded. X and Y keep their columns, the other outputs are appended (R as Rlock) """
+        names   = [name.strip() for name in str(cols).split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.lock_in.SNAP_LIST]
+        if unknown: print(f"Unknown lock-in outputs {', '.join(unknown)} are not recorded")
+
+        channels = ['X'] + [name for name in dict.fromkeys(names) if name in self.lock_in.SNAP_LIST and name != 'X']
+        if len(channels) > self.lock_in.SNAP_MAX:
+            print(f"Only the first {self.lock_in.SNAP_MAX} lock-in outputs fit in one query: {', '.join(channels[self.lock_in.SNAP_MAX:])} are not recorded")
+            channels = channels[:self.lock_in.SNAP_MAX]
+
+        self._channels = channels
+        self._columns  = self.COLUMNS + [self.RENAME.get(ch, ch) for ch in channels if ch not in ['X', 'Y']]
+
     def start(self):
-        start = float(self.parameters.user.start.value)
-        end   = float(self.parameters.user.end.value)
-        vel   = float(self.parameters.user.vel.value)
-        step  = float(self.parameters.user.step.value)
-        wait  = float(self.parameters.user.wait.value)
-        fast  = self.parameters.user.fast.value
-        tcons = float(self.parameters.hidden.tcons.value)
-        ymax  = float(self.parameters.user.ymax.value) * 1e-9  # convert to A
-        ptsup = int(self.parameters.user.ptsup.value)
-        get_Y = self.parameters.user.get_Y.value
-        get_R = self.parameters.user.get_R.value
-        
-        plot  = LivePlot(start, end, -ymax, ymax)
-        
-        self.delay_line.return_to(start)
+        """ Starts the acquisition in a worker thread. Samples are pushed to a ring buffer that
+        the GUI drains into the live plot by calling poll """
+        start     = float(self.parameters.user.start.value)
+        end       = float(self.parameters.user.end.value)
+        vel       = float(self.parameters.user.vel.value)
+        step      = float(self.parameters.user.step.value)
+        wait      = float(self.parameters.user.wait.value)
+        fast      = self.parameters.user.fast.value
+        tcons     = float(self.parameters.hidden.tcons.value)
+        settle_on = self.parameters.user.settle.value
+        stable    = self.parameters.user.stable.value
+        bidir     = self.parameters.user.bidir.value and fast
+        ymax      = float(self.parameters.user.ymax.value) * 1e-9  # convert to A
+        rate      = float(self.parameters.user.rate.value)
+        buff      = self.parameters.user.buffer.value
+        sync      = self.parameters.user.sync.value
+        adapt     = self.parameters.user.adapt.value and not fast
+        budget    = float(self.parameters.user.budget.value)
+        get_R     = self.parameters.user.get_R.value
+        rper      = float(self.parameters.user.rper.value)
+        spec      = self.parameters.user.spec.value
+
+        self._plot      = LivePlot(start, end, -ymax, ymax, adapt, float(self.parameters.user.fps.value), spec)
+        self._spectrum  = LiveSpectrum(self._plot.spectrum_ax) if spec else None
+        self._start     = start
+        self._scan_from = 0
+        self._repeat    = max(int(self.parameters.user.repeat.value), 1)
+        self._chunks    = self.parameters.user.chunks.value and self._repeat > 1
+        self._data      = None
+        self._name      = self._filename()
+        self._settings  = self.parameters.settings
+        self._pending   = 0
+        self._durations = {'acquire': 0., 'plot': 0., 'save': 0.}
+        self._buffer.clear()
+        self._set_channels(self.parameters.user.cols.value)
+        self._set_profiling(self.parameters.user.profile.value)
+        self._stop.clear()
+
+        if settle_on: settle = self.lock_in.SETTLE_LIST[int(float(self.parameters.hidden.slope.value))] * tcons
+        else:         settle = wait * tcons
+        tol = self.STABLE_TOL * float(self.parameters.hidden.sens.value) * 1e-9 if stable else None  # A
+        lag = float(self.parameters.hidden.slope.value) / 6 * tcons if bidir else 0.  # Filter group delay (s)
+
+        settings = dict(start=start, end=end, vel=vel, step=step, settle=settle, tol=tol, fast=fast, tcons=tcons,
+                        rate=rate, buff=buff, sync=sync, adapt=adapt, budget=budget, bidir=bidir, lag=lag,
+                        get_R=get_R, rper=rper)
+        self._thread = threading.Thread(target=self._run, kwargs=settings, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, interval=.05):
+        """ Runs a whole measurement blocking the caller, e.g. without the GUI """
+        self.start()
+        while self.poll(): tm.sleep(interval)
+
+    def poll(self):
+        """ Drains new samples into the live plot. Finishes the measurement (final plot and save)
+        once the worker is done. Returns True while the measurement is running """
+        running = self.is_running
+        points  = self._buffer.drain()
+        for scan in np.split(points, np.flatnonzero(np.isnan(points[:, 0])) + 1):
+            self._plot.append(scan[:, 0], scan[:, 1])
+            self._pending += len(scan)
+            if len(scan) and np.isnan(scan[-1, 0]): self._end_scan()  # Separator of repeated scans
+
+        if self._pending:
+            t0 = tm.perf_counter()
+            if self._plot.update(force=not running): self._pending = 0  # At most fps redraws per s
+            if self._spectrum and self._spectrum.update(*self._scan_trace(), force=not running):
+                self._plot.redraw()
+            self._durations['plot'] += tm.perf_counter() - t0
+
+        if not running:
+            self._finish()
+        return running
+
+    def _scan_trace(self):
+        """ Time (ps) and X of the live plot points of the current scan """
+        pos = self._plot.x[self._scan_from:]
+        return Convert.mm_to_ps(2 * (self._start - pos)), self._plot.y[self._scan_from:]
+
+    def _end_scan(self):
+        if self._spectrum:
+            self._spectrum.update(*self._scan_trace(), force=True)
+            self._spectrum.end_scan()
+        self._scan_from = len(self._plot.x)
+
+    def _run(self, **settings):
+        t0 = tm.perf_counter()
+        try:
+            with StreamWriter(f'{self.DATA_FOLDER}/{self._name}.part', self._columns) as self._writer:
+                average = ScanAverage(['X', 'Y', 'R'] + self._columns[len(self.COLUMNS):])
+                data    = None
+                for scan in range(self._repeat):
+                    if scan and self._stop.is_set(): break
+                    if scan: self._buffer.push(np.nan, np.nan)  # Scan separator for the live plot
+
+                    try:
+                        last = self._acquire(scan=scan, **settings)
+                    except Exception as error:  # Keeps the scans already done
+                        print(f"Scan {scan + 1} failed: {error}")
+                        break
+                    if last is None: break
+                    data = last
+                    if self._stop.is_set(): break  # Interrupted scans are not averaged, a first one is saved as is
+                    if self._chunks: data.to_csv(f'{self.DATA_FOLDER}/{self._name}_scan{scan + 1}.dat', sep='\t', index=False)
+                    if self._repeat > 1:
+                        average.add(data)
+                        print(f"Scan {scan + 1} of {self._repeat} done")
+                self._data = average.table() if average.scans else data
+        except Exception as error:
+            print(f"Measurement failed: {error}")
+        finally:
+            self.delay_line.stop_polling()
+            self._durations['acquire'] = tm.perf_counter() - t0
+
+    def _lock_in_columns(self, values):
+        """ Splits lock-in values (points x channels) into the X and Y columns, NaN when Y is not
+        recorded, and the list of extra output columns """
+        values  = np.asarray(values, dtype=float).reshape(-1, len(self._channels))
+        columns = dict(zip(self._channels, values.T))
+        nan     = np.full(len(values), np.nan)
+        extra   = [columns[ch] for ch in self._channels if ch not in ['X', 'Y']]
+        return columns['X'], columns.get('Y', nan), extra
+
+    def _record(self, start, ts, pos, values, R, dpos=np.nan, plot_pos=None):
+        """ Pushes samples to the live plot buffer and streams them to the partial data file, with
+        the same pos as the saved table. The live plot shows plot_pos instead when given, e.g. the
+        measured position of a step """
+        t    = Convert.mm_to_ps(2 * (start - np.asarray(pos)))
+        X, Y, extra = self._lock_in_columns(values)
+        rows = np.column_stack(np.broadcast_arrays(t, X, Y, R, pos, dpos, ts, *extra))
+        if plot_pos is None: self._buffer.extend(rows[:, [4, 1]])
+        else:                self._buffer.extend(np.column_stack(np.broadcast_arrays(plot_pos, X)))
+        self._writer.write(rows)
+
+    def _acquire(self, *, start, end, vel, step, settle, tol, fast, tcons, rate, buff, sync, adapt, budget,
+                 bidir, lag, get_R, rper, scan=0):
+        """ Measures the repeat number scan with the settings built in start, keyword only so that
+        adding one cannot shift the others """
+        if fast:  # Sweeps start beyond start so the window is crossed at constant velocity
+            back   = bidir and scan % 2 == 1  # Odd bidirectional sweeps run back from end to start
+            self.delay_line.set_vel(vel)
+            plan   = ScanPlan(end if back else start, start if back else end, vel, self.delay_line.get_acc(), vel * self.RUN_UP)
+            origin = plan.pre
+            shift  = -plan.direction * vel * lag  # To the position of the lagging lock-in output
+        elif not adapt:  # Odd repeats run backwards, which saves the return move
+            steps  = np.arange(start, end, -step)[::-1 if scan % 2 else 1]
+            origin = steps[0]
+        else:
+            origin = start
+        if bidir and scan:  # Continues from the end of the last sweep, the lock-in settled on the way
+            if not self._wait_moved(self.MOVE_TIMEOUT): return None
+        else:
+            self.delay_line.return_to(origin)
         self.delay_line.start_polling(10)
         self.delay_line.set_vel(vel)
-        tm.sleep(10 * tcons)              # Wait 10 time constants before start
+        if not (bidir and scan): tm.sleep(10 * tcons)  # Wait 10 time constants before start
 
         R0 = self.thermometer.get_fres()  # Temp save of T before start
 
+        # Continuous measurements using the lock-in buffer ####################
+        if fast and buff:
+            ts, pos, V, stats = self._buffered_scan(start, plan, rate, sync, shift)
+            N = len(pos)
+            i = N - 1
+
+            R    = np.full(N, np.nan)  # Thermometer is too slow for buffered rates
+            dpos = np.full(N, np.nan)
+
         # Continuous measurements #############################################
-        if fast:
-            dt = .1
-            t0 = tm.time()
-            T  = (start - end) / vel
-            N  = int(T / dt)
-            
-            d = np.full(N, np.nan)  # Delay line positions
-            X = np.full(N, np.nan)  # Lock-in X measurement
-            Y = np.full(N, np.nan)  # Lock-in Y measurement
-            R = np.full(N, np.nan)  # Thermometer resistance
-            
-            self.delay_line.move_to(end, timeout=0)
-            for i in range(N):
-                tm.sleep(dt - (tm.time() - t0) % dt)
-                
-                d[i] = self.delay_line.get_pos()
-                X[i], Y[i], R[i] = self._get_point(get_Y, get_R)
-                
-                if i % ptsup == 0: plot.update(d, X)  # Update every ptsup points
-                if d[i] <= end: break
-            
-            pos, dpos = d, np.full(N, np.nan)
+        elif fast:
+            N     = plan.points(rate)
+            clock = SampleClock(rate)
+
+            t  = np.full(N, np.nan)  # Sample timestamps
+            tl = np.full(N, np.nan)  # Lock-in read host times
+            d  = np.full(N, np.nan)  # Delay line positions
+            V  = np.full((N, len(self._channels)), np.nan)  # Lock-in outputs
+            R  = np.full(N, np.nan)                         # Thermometer resistance
+
+            with self._position_source(sync) as source, self._point_reader(source, get_R, rper) as reader:
+                self._sweep(plan)
+                clock.start()
+                for i in range(N):
+                    t[i] = clock.wait()
+                    d[i], V[i], R[i] = reader.read()
+                    tl[i] = reader.time
+
+                    self._record(start, t[i], d[i] + shift, V[i], R[i])
+                    if plan.passed(d[i]) or self._stop.is_set(): break
+
+            N = i + 1  # Drop the points never reached
+            ts, pos, V, R = t[:N], d[:N], V[:N], R[:N]
+            if sync:  # Positions at the lock-in read times instead of the last polled ones
+                ts  = tl[:N] - clock.t0
+                pos = source.position(tl[:N])
+            pos   = pos + shift
+            dpos  = np.full(N, np.nan)
+            stats = clock.stats()
+
+        # Adaptive step measurements ##########################################
+        elif adapt:
+            limits = self.delay_line.get_vel(), self.delay_line.get_acc()  # Read once, not on every step
+            ts, pos, dpos, V, R, stats = self._adaptive_scan(start, end, step, limits, settle, tol, tcons, budget, get_R, rper)
+            N = len(pos)
+            i = N - 1
 
         # Step measurements ###################################################
         else:
-            pos = np.arange(start, end, -step)
-            N   = len(pos)
-            
+            pos    = steps
+            N      = len(pos)
+            clock  = SampleClock()
+            limits = self.delay_line.get_vel(), self.delay_line.get_acc()  # Read once, not on every step
+
+            t = np.full(N, np.nan)  # Sample timestamps
             d = np.full(N, np.nan)  # Delay line positions
-            X = np.full(N, np.nan)  # Lock-in X measurement
-            Y = np.full(N, np.nan)  # Lock-in Y measurement
-            R = np.full(N, np.nan)  # Thermometer resistance
-            
-            for i in range(N):
-                self._delay_line.move_to(pos[i])
-                tm.sleep(wait * tcons)
-                
-                d[i]       = self.delay_line.get_pos()
-                X[i], Y[i], R[i] = self._get_point(get_Y, get_R)
-                
-                if i % ptsup == 0: plot.update(d, X)  # Update every ptsup points
-                
+            V = np.full((N, len(self._channels)), np.nan)  # Lock-in outputs
+            R = np.full(N, np.nan)                         # Thermometer resistance
+
+            with self._point_reader(self.delay_line, get_R, rper) as reader:
+                clock.start()
+                for i in range(N):
+                    point = self._step(reader, clock, pos[i], limits, settle, tol, tcons)
+                    if point is None: break
+                    t[i], (d[i], V[i], R[i]) = point
+
+                    self._record(start, t[i], pos[i], V[i], R[i], d[i] - pos[i], d[i])
+                    if self._stop.is_set(): break
+
+            ts    = t
             dpos  = (d - pos)
-        
+            stats = clock.stats()
+
         #######################################################################
 
         R1 = self.thermometer.get_fres()  # Temp save of T after end
 
-        self.delay_line.stop_polling()
-        plot.final(pos, X * 1e9)  # Change signal units from A to nA
-
-        if not get_R:
+        if not get_R and N:  # No point when stopped early
             R[0] = R0
             R[i] = R1
-        
-        data = self._dataframe(start, pos, dpos, X, Y, R)
-        fig  = plot.fig
-        self._save(data, fig)
+
+        self.parameters.timing.set_stats(stats)
+        return self._dataframe(start, ts, pos, dpos, V, R)
+
+    def _finish(self):
+        if self._spectrum: self._spectrum.end_scan()
+        if self._data is None:
+            self._message("Measurement failed, nothing was saved")
+            return
+        t0 = tm.perf_counter()
+        self._plot.final(self._data['pos'], self._data['X'] * 1e9)  # Change signal units from A to nA
+        t1 = tm.perf_counter()
+        self._save(self._data, self._plot.fig)
+        self._durations['plot'] += t1 - t0
+        self._durations['save'] += tm.perf_counter() - t1
+
+    def _step(self, reader, clock, target, limits, settle, tol=None, interval=None):
+        """ Moves to target without blocking, at the stage (velocity, acceleration) limits, and
+        reads a point once the stage stopped and the lock-in settled. The filter sees the move as a
+        step at the middle of the trajectory, so the settle time (s) runs from there, alongside the
+        deceleration. With a tolerance tol (A), the point is read every interval (s) from the
+        arrival until two consecutive X reads agree within tol, at the latest once settled. Returns
+        the point time and the read, or None if stopped before the stage arrived """
+        origin = self.delay_line.get_pos()
+        move   = Trajectory(origin, target, *limits)
+        t0     = tm.perf_counter()
+        self.delay_line.move_to(target, timeout=0)
+        settled = t0 + move.duration / 2 + settle
+
+        tm.sleep(max(t0 + move.duration - tm.perf_counter(), 0))  # Status may lag the move command
+        if not self._wait_moved(self.MOVE_TIMEOUT): return None
+
+        if tol is None:
+            tm.sleep(max(settled - tm.perf_counter(), 0))
+            return clock.wait(), reader.read()
+
+        last = np.nan
+        while True:
+            t, read = clock.now(), reader.read()
+            if abs(read[1][0] - last) <= tol or tm.perf_counter() >= settled:
+                clock.wait()  # Only count the kept read
+                return t, read
+            last = read[1][0]
+            tm.sleep(min(interval, max(settled - tm.perf_counter(), 0)))
+
+    def _wait_moved(self, timeout):
+        """ Waits for the delay line to stop. Returns False if the measurement is stopped first,
+        raises TimeoutError if the stage still moves after timeout (s) """
+        deadline = tm.perf_counter() + timeout
+        while self.delay_line.is_moving():
+            if self._stop.is_set(): return False
+            if tm.perf_counter() > deadline: raise TimeoutError(f"Delay line still moving after {timeout} s")
+            tm.sleep(self.MOVE_POLL)
+        return True
+
+    def _adaptive_scan(self, start, end, step, limits, settle, tol, tcons, budget, get_R, rper):
+        """ Stepped scan that measures a coarse pass on every ADAPT_COARSE steps, then rounds of
+        midpoints where the signal changes or is large (see AdaptiveGrid), down to step. Refinement
+        stops once the next point would end past budget (s). Points are returned in scan order, with
+        the grid positions as pos and the measured offsets from them as dpos, as in stepped scans """
+        grid  = AdaptiveGrid(start, end, step, self.ADAPT_COARSE, self.ADAPT_THRESHOLD)
+        clock = SampleClock()
+        rows  = {}  # grid index -> (t, pos, dpos, R, *values)
+
+        with self._point_reader(self.delay_line, get_R, rper) as reader:
+            clock.start()
+            pending = grid.coarse()
+            while pending and not self._stop.is_set():
+                k      = pending.pop(0)
+                target = grid.position(k)
+                point  = self._step(reader, clock, target, limits, settle, tol, tcons)
+                if point is None: break
+                t, (d, values, R) = point
+
+                grid.add(k, values[0])
+                rows[k] = (t, target, d - target, R, *values)
+                self._record(start, t, target, values, R, d - target, d)
+
+                if not pending: pending = grid.refine()
+                if grid.refining and clock.now() * (len(rows) + 1) / len(rows) > budget: break
+
+        if not rows:  # Stopped before the first point
+            return np.empty(0), np.empty(0), np.empty(0), np.empty((0, len(self._channels))), np.empty(0), clock.stats()
+        rows = np.array([rows[k] for k in sorted(rows)])
+        return rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 4:], rows[:, 3], clock.stats()
+
+    def _sweep(self, plan):
+        """ Starts the planned move without blocking and returns once the stage enters the window """
+        self.delay_line.move_to(plan.post, timeout=0)
+        tm.sleep(plan.t_in)
+
+    def _buffered_scan(self, start, plan, rate, sync=False, shift=0.):
+        """ Sweeps the delay line while the lock-in stores X and Y in its own buffer at the given
+        rate. Buffer chunks are read during the sweep and each sample is matched to the delay line
+        position by interpolating host timestamped position reads onto the buffer sample times,
+        taken from a PositionTracker when syncing, then moved by shift (mm). Only X and Y are
+        buffered, other lock-in outputs are left NaN. start is the time origin of the scan """
+        T     = plan.window
+        rate  = self.lock_in.buffer_setup(min(rate, self.lock_in.BUFFER_SIZE / T))
+        N     = min(plan.points(rate), self.lock_in.BUFFER_SIZE)
+        poll  = .02                     # Position polling interval (s)
+        chunk = max(int(rate * .1), 1)  # Points per buffer read (~every 100 ms)
+
+        V = np.full((N, len(self._channels)), np.nan)  # Lock-in outputs
+        t = np.arange(N) / rate                        # Buffer sample times since trigger
+        buffered = [(channel, self._channels.index(ch)) for channel, ch in [(1, 'X'), (2, 'Y')] if ch in self._channels]
+        t_pos, d_pos = [], []   # Host timestamped delay line positions
+
+        n     = 0
+        clock = SampleClock(1 / poll)
+        with self._position_source(sync) as source:
+            self._sweep(plan)
+            t0 = tm.perf_counter()
+            self.lock_in.buffer_start()
+            clock.start()
+            t_start = (t0 + clock.t0) / 2 - clock.t0  # Buffer trigger on the clock time base
+
+            def locate(times):
+                if sync: return source.position(clock.t0 + t_start + times) + shift
+                return np.interp(times, t_pos, d_pos) + shift
+
+            while True:
+                t_pos.append(clock.now() - t_start)
+                d_pos.append(source.get_pos())
+                done = plan.passed(d_pos[-1]) or t_pos[-1] > 2 * T or self._stop.is_set()
+
+                count = min(self.lock_in.buffer_count(), N)
+                if count - n >= chunk or done:
+                    for channel, j in buffered:
+                        V[n:count, j] = self.lock_in.read_buffer(channel, n, count - n)
+                    self._record(start, t[n:count], locate(t[n:count]), V[n:count], np.nan)
+                    n = count
+                if done: break
+                clock.wait()
+
+        self.lock_in.buffer_pause()
+
+        n = min(n, np.searchsorted(t, t_pos[-1], side='right'))  # Drop samples after the sweep
+        d = locate(t[:n])
+
+        stats = clock.stats()  # Host polling loop timing, samples are clocked by the lock-in
+        stats.update(points=n, missed=0, rate=rate)
+        return t[:n], d, V[:n], stats
 
     def _save(self, data, fig):
-        filename = self._filename()
-        
-        self.parameters.save(self.INFO_FOLDER, f'{filename}.txt')
+        filename = self._name
+
+        self.parameters.save(self.INFO_FOLDER, f'{filename}.txt', self._latency_table(), self._settings)
         data.to_csv(f'{self.DATA_FOLDER}/{filename}.dat', sep='\t', index=False)
+        if self.parameters.user.binary.value:
+            meta = pd.concat([self._settings, self.parameters.timing.table]).to_dict('index')
+            ColumnFile.write(f'{self.DATA_FOLDER}/{filename}{ColumnFile.EXTENSION}', data, meta)
         fig.savefig(f'{self.PLOT_FOLDER}/{filename}.png', dpi=72)
-        
-        message = f"Saved data as {filename}"
-        self.widget.set_message(message)
+        os.remove(f'{self.DATA_FOLDER}/{filename}.part')  # Streamed copy no longer needed
+
+        self._message(f"Saved data as {filename}")
+
+    def _set_profiling(self, profile):
+        for instrument in [self.lock_in, self.thermometer]:
+            if profile: instrument.enable_profiling()
+            else:       instrument.disable_profiling()
+
+    def _latency_table(self):
+        """ VISA latency count, p50 and p99 per command as info file rows, or None if not profiling """
+        tables = []
+        for instrument in [self.lock_in, self.thermometer]:
+            for command, row in instrument.latency_table().iterrows():
+                for stat, unit in [('count', ''), ('p50', 'ms'), ('p99', 'ms')]:
+                    tables.append(pd.DataFrame({'name': f'{instrument.name} {command} {stat}', 'unit': unit,
+                                                'value': round(row[stat], 3)}, index=[f'{instrument.name}:{command}:{stat}']))
+        return pd.concat(tables) if tables else None
+
+    def _message(self, message):
+        if self.widget: self.widget.set_message(message)
         print(message)
 
-    @staticmethod
-    def _dataframe(start, pos, dpos, X, Y, R):
+    @classmethod
+    def recover(cls, filename):
+        """ Rebuilds the .dat file of an interrupted scan from its streamed .part file """
+        data = StreamWriter.read(f'{cls.DATA_FOLDER}/{filename}.part')
+        data.to_csv(f'{cls.DATA_FOLDER}/{filename}.dat', sep='\t', index=False)
+        print(f"Recovered {len(data)} points of {filename}")
+        return data
+
+    def _dataframe(self, start, ts, pos, dpos, values, R):
         t = Convert.mm_to_ps(2 * (start - pos))
-        return pd.DataFrame({'t': t, 'X': X, 'Y': Y, 'R': R, 'pos': pos, 'dpos': dpos})
-    
+        X, Y, extra = self._lock_in_columns(values)
+        return pd.DataFrame(dict(zip(self._columns, [t, X, Y, R, pos, dpos, ts, *extra])))
+
     def _filename(self):
         timestamp = tm.strftime('%Y%m%d-%H%M%S')
         start     = self.parameters.user.start.value
@@ -171,32 +563,60 @@ class Measurement:
 
 
 class MeasurementWidget:
+    POLL_INTERVAL = 50  # ms between live plot updates
+
     def __init__(self, frame, measurement):
+        self._frame        = frame
         self._measurement  = measurement
         self._start_button = ttk.Button(frame, text="Start", command=self._start)
+        self._stop_button  = ttk.Button(frame, text="Stop", command=self._stop, state='disabled')
         self._message      = ttk.Label(frame, text="")
 
         options = {'sticky': tk.W, 'padx': 5, 'pady': 5}
         self._start_button.grid(row=0, column=1, **options)
-        self._message.grid(row=0, column=2, **options)
-        
+        self._stop_button.grid(row=0, column=2, **options)
+        self._message.grid(row=0, column=3, **options)
+
     @property
     def measurement(self): return self._measurement
-    
+
     @property
     def _all_set(self):
         set_params = self.measurement.parameters.widget.is_set
         set_lockin = self.measurement.lock_in.is_connected
         set_thermo = self.measurement.thermometer.is_connected
         set_delayl = self.measurement.delay_line.is_connected
-        
+
         return set_params and set_lockin and set_thermo and set_delayl
 
     def set_message(self, message):
         self._message['text'] = message
 
     def _start(self):
-        if self._all_set:
+        if self._all_set and not self.measurement.is_running:
             print("Measurement start")
+            self._widgets_enable(False)  # The worker shares the instruments and parameters
             self.measurement.start()
+            self._start_button['state'] = 'disabled'
+            self._stop_button['state']  = 'normal'
+            self.set_message("Measuring...")
+            self._frame.after(self.POLL_INTERVAL, self._poll)
+
+    def _widgets_enable(self, enable):
+        for instrument in [self.measurement.lock_in, self.measurement.thermometer, self.measurement.delay_line]:
+            if enable: instrument.widget_enable()
+            else:      instrument.widget_disable()
+        self.measurement.parameters.widget.setbtn['state'] = 'normal' if enable else 'disabled'
+
+    def _stop(self):
+        print("Measurement stop requested")
+        self.measurement.stop()
+
+    def _poll(self):
+        if self.measurement.poll():
+            self._frame.after(self.POLL_INTERVAL, self._poll)
+        else:
+            self._start_button['state'] = 'normal'
+            self._stop_button['state']  = 'disabled'
+            self._widgets_enable(True)
             self.measurement.parameters.widget.unset()
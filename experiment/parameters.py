@@ -13,6 +13,7 @@ class Parameters:
         self._user    = UserParams()
         self._label   = LabelParams()
         self._hidden  = HiddenParams()
+        self._timing  = TimingParams()
         self._widget  = None
 
         self._load_preset()
@@ -26,19 +27,29 @@ class Parameters:
     @property
     def hidden(self): return self._hidden
     @property
+    def timing(self): return self._timing
+    @property
     def widget(self): return self._widget
 
+    @property
+    def settings(self):
+        """ User, label and hidden parameters, all but the timing of the last scan """
+        return pd.concat([self.user.table, self.label.table, self.hidden.table])
     @property
     def table(self):
-        table_ = pd.concat([self.user.table, self.label.table, self.hidden.table])
+        table_ = pd.concat([self.settings, self.timing.table])
         return table_
 
     def create_widget(self, frame):
         self._widget = ParametersWidget(frame, self)
         print("Parameters widget successfully created")
 
-    def save(self, folder, file):
-        self.table.to_csv(f'{folder}/{file}', sep='\t')
+    def save(self, folder, file, extra=None, settings=None):
+        """ extra is an optional table (name, unit and value columns) appended to the parameters.
+        settings replaces the current settings, e.g. with the copy taken when a scan started """
+        table = self.table if settings is None else pd.concat([settings, self.timing.table])
+        if extra is not None: table = pd.concat([table, extra])
+        table.to_csv(f'{folder}/{file}', sep='\t')
         print(f"Saved parameters to {folder}/{file}")
         
     def save_preset(self):
@@ -55,6 +66,8 @@ class Parameters:
 
 
 class ParametersWidget:
+    CHECK_KEYS = ['fast', 'buffer', 'bidir', 'sync', 'adapt', 'settle', 'stable', 'spec', 'chunks', 'get_R', 'binary', 'profile']
+
     def __init__(self, frame, parameters):
         self._parameters = parameters
 
@@ -62,16 +75,16 @@ class ParametersWidget:
         label_width_1 = 10
         label_width_2 = 41
 
-        for i, key in enumerate(parameters.user.dic):
-            if key not in ['fast', 'get_Y', 'get_R']:
+        entry_row, check_row = 0, 3
+        for key in parameters.user.dic:
+            if key not in self.CHECK_KEYS:
                 self.__dict__[key] = Entry(frame, parameters.user.dic[key], user_width)
+                self.__dict__[key].container.grid(row=entry_row, column=0, sticky=tk.W)
+                entry_row += 1
             else:
                 self.__dict__[key] = CheckButton(frame, parameters.user.dic[key])
-
-            if key not in ['fast', 'get_Y', 'get_R']:
-                self.__dict__[key].container.grid(row=i, column=0, sticky=tk.W)
-            else:
-                self.__dict__[key].container.grid(row=i-3, column=2, sticky=tk.W)
+                self.__dict__[key].container.grid(row=check_row, column=2, sticky=tk.W)
+                check_row += 1
 
         for i, key in enumerate(parameters.label.dic):
             special_keys = ['pols', 'sample', 'obs']
@@ -82,7 +95,7 @@ class ParametersWidget:
             self.__dict__[key].container.grid(row=row, column=column, sticky=tk.W)
 
         self.setbtn = ttk.Button(frame, text="Set", command=self._setbtn_clicked)
-        self.setbtn.grid(row=7, column=0, padx=5, pady=5, sticky=tk.W)
+        self.setbtn.grid(row=max(entry_row, check_row), column=0, padx=5, pady=5, sticky=tk.W)
 
     @property
     def is_set(self): return not (self.setbtn['text'] == "Set")
@@ -94,11 +107,13 @@ class ParametersWidget:
         for key in self._parameters.label.dic:
             self.__dict__[key].to_param()
         try:
+            self._parameters.lock_in.refresh()  # Front panel changes are only seen after a refresh
             self._parameters.hidden.sens.set_value(self._parameters.lock_in.get_sens())
             self._parameters.hidden.tcons.set_value(self._parameters.lock_in.get_tcons())
+            self._parameters.hidden.slope.set_value(self._parameters.lock_in.get_slope())
             self._parameters.hidden.freq.set_value(self._parameters.lock_in.get_freq())
         except:
-            print("No lock-in is connected, could not retrieve sensitivity, time constant and chop freq")
+            print("No lock-in is connected, could not retrieve sensitivity, time constant, slope and chop freq")
         finally:
             print("Parameters are set")
 
@@ -134,10 +149,10 @@ class ParametersWidget:
 
 
 class Param:
-    def __init__(self, name, unit=''):
+    def __init__(self, name, unit='', value=''):
         self._name  = name
         self._unit  = unit
-        self._value = ''
+        self._value = value
 
     def __repr__(self):
         return f"Parameter {self.name} @ {self.value}{self.unit}"
@@ -164,12 +179,12 @@ class ParamSet:
 
     @property
     def table(self):
-        table_ = pd.DataFrame()
+        tables = []
         for param in self.dic:
             df = self.dic[param].table
             df.index = [param]
-            table_ = table_.append(df)
-        return table_
+            tables.append(df)
+        return pd.concat(tables)
 
     def load(self, folder, file):
         df = pd.read_table(f'{folder}/{file}', index_col=0).fillna('')
@@ -180,16 +195,30 @@ class ParamSet:
 
 class UserParams(ParamSet):
     def __init__(self):
-        self.start = Param('Start', 'mm')
-        self.end   = Param('End', 'mm')
-        self.vel   = Param('Velocity', 'mmps')
-        self.step  = Param('Step size', 'mm')
-        self.wait  = Param('Wait time', 'tcons')
-        self.ymax  = Param('Plot ymax', 'nA')
-        self.ptsup = Param('Pts update')
-        self.fast  = Param('Fast scan')
-        self.get_Y = Param('Get Y')
-        self.get_R = Param('Get R')
+        self.start   = Param('Start', 'mm')
+        self.end     = Param('End', 'mm')
+        self.vel     = Param('Velocity', 'mmps')
+        self.step    = Param('Step size', 'mm')
+        self.wait    = Param('Wait time', 'tcons')
+        self.budget  = Param('Time budget', 's', 600)
+        self.repeat  = Param('Repeats', '', 1)
+        self.ymax    = Param('Plot ymax', 'nA')
+        self.fps     = Param('Plot rate', 'Hz', 20)
+        self.rate    = Param('Sample rate', 'Hz', 10)
+        self.rper    = Param('R period', 's', 1)
+        self.cols    = Param('Lock-in cols', '', 'X,Y')
+        self.fast    = Param('Fast scan')
+        self.buffer  = Param('Use buffer')
+        self.bidir   = Param('Bidirectional')
+        self.sync    = Param('Sync position')
+        self.adapt   = Param('Adaptive step')
+        self.settle  = Param('Slope settle')
+        self.stable  = Param('Read stable')
+        self.spec    = Param('Live spectrum')
+        self.chunks  = Param('Save scans')
+        self.get_R   = Param('Get R')
+        self.binary  = Param('Save binary')
+        self.profile = Param('Profile VISA')
 
 
 class LabelParams(ParamSet):
@@ -208,9 +237,26 @@ class HiddenParams(ParamSet):
     def __init__(self):
         self.sens  = Param('Sensitivity', 'nA')
         self.tcons = Param('Time const.', 's')
+        self.slope = Param('Filter slope', 'dB/oct')
         self.freq  = Param('Chop freq', 'Hz')
 
 
+class TimingParams(ParamSet):
+    def __init__(self):
+        self.points = Param('Points')
+        self.missed = Param('Missed ticks')
+        self.srate  = Param('Mean rate', 'Hz')
+        self.p50    = Param('Loop p50', 'ms')
+        self.p99    = Param('Loop p99', 'ms')
+
+    def set_stats(self, stats):
+        self.points.set_value(stats['points'])
+        self.missed.set_value(stats['missed'])
+        self.srate.set_value(round(stats['rate'], 3))
+        self.p50.set_value(round(stats['p50'], 3))
+        self.p99.set_value(round(stats['p99'], 3))
+
+
 class Entry:
     def __init__(self, frame, param, width):
         self._param      = param
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from math import factorial
+from scipy.fft import rfft, irfft, rfftfreq, next_fast_len
+
+
+class LockinFilter:
+    """ Output low pass of the lock-in: slope / 6 cascaded RC stages (6 dB/oct each) of time
+    constant tcons (s), with impulse response t^(n-1) e^(-t/tcons) """
+    def __init__(self, tcons, slope=12):
+        self._tcons = float(tcons)
+        self._order = max(int(round(float(slope) / 6)), 1)
+
+    def __repr__(self):
+        return f"LockinFilter(tcons={self._tcons}, slope={6 * self._order})"
+
+    @property
+    def tcons(self): return self._tcons
+    @property
+    def order(self): return self._order
+    @property
+    def delay(self): return self._order * self._tcons  # Group delay at low frequency (s)
+
+    def impulse(self, t):
+        """ Impulse response (1/s) at the times t (s), of unit area """
+        t = np.asarray(t, dtype=float)
+        s = np.clip(t, 0, None)
+        n = self._order
+        return np.where(t >= 0, s**(n - 1) * np.exp(-s / self._tcons) / (factorial(n - 1) * self._tcons**n), 0.)
+
+    def response(self, f):
+        """ Frequency response at the frequencies f (Hz) """
+        return (1 + 2j * np.pi * np.asarray(f) * self._tcons) ** -self._order
+
+
+class Deconvolution:
+    """ Removes the lock-in filter from fast scan traces. At the stage velocity vel (mm/s) the
+    delay runs at 2 vel / C ps per s, so on the time axis of the trace the filter has the time
+    constant 2 vel tcons / C (ps). It is causal towards increasing t for direction 1, decreasing t
+    for -1, values in between weigh the two, e.g. 0 for an average of as many sweeps each way.
+    shifted tells that the positions were already moved back by the group delay (bidirectional
+    scans), then only the smearing is removed. The inverse is regularized (Tikhonov) as
+    H* / (|H|^2 + reg), reg being about the noise to signal power ratio: the gain never exceeds
+    1 / (2 sqrt(reg)), higher values are smoother """
+    C = 299_792_458e3/1e12  # mm/ps
+    DEFAULT_SLOPE = 12      # dB/oct assumed when the scan parameters have none (SR830 default)
+
+    def __init__(self, tcons, slope, vel, reg=1e-3, direction=1, shifted=False):
+        self._filter    = LockinFilter(tcons, slope)
+        self._vel       = float(vel)
+        self._reg       = float(reg)
+        self._direction = float(direction)
+        self._shifted   = bool(shifted)
+
+    def __repr__(self):
+        return (f"Deconvolution(tcons={self._filter.tcons}, slope={6 * self._filter.order}, vel={self._vel}, "
+                f"reg={self._reg}, direction={self._direction}, shifted={self._shifted})")
+
+    @property
+    def filter(self): return self._filter
+    @property
+    def tau(self): return 2 * self._vel / self.C * self._filter.tcons  # Time constant on the t axis (ps)
+
+    def response(self, f):
+        """ Filter response at the frequencies f (THz) of the trace """
+        forward = (1 + 2j * np.pi * np.asarray(f) * self.tau) ** -self._filter.order
+        if self._shifted:
+            forward = forward * np.exp(2j * np.pi * np.asarray(f) * self._filter.order * self.tau)
+        weight = (1 + self._direction) / 2
+        return weight * forward + (1 - weight) * np.conj(forward)
+
+    def apply(self, E, dt):
+        """ Deconvolved copy of the trace E sampled every dt (ps). It is zero padded by ten
+        filter lengths so that the inverse filter does not wrap around """
+        E = np.asarray(E, dtype=float)
+        N = len(E)
+        M = next_fast_len(N + int(np.ceil(10 * self._filter.order * self.tau / dt)), real=True)
+        H = self.response(rfftfreq(M, dt))
+        W = np.conj(H) / (np.abs(H)**2 + self._reg)
+        return irfft(rfft(E, M) * W, M)[:N]
+
+    @classmethod
+    def from_params(cls, table, reg=1e-3, slope=None):
+        """ From the parameters of a scan, either an info file table (name, unit and value columns)
+        or the metadata of a binary column file. Returns None for stepped scans, which the filter
+        does not distort. slope (dB/oct) overrides the recorded one, older info files have none
+        and then DEFAULT_SLOPE is assumed """
+        if isinstance(table, pd.DataFrame): values = table['value'].to_dict()
+        else:                               values = {key: row['value'] for key, row in table.items()}
+        flag   = lambda key: str(values.get(key, False)) == 'True'
+        number = lambda key: float(values[key]) if str(values.get(key, '')).strip() else None  # '' if offline
+        if not flag('fast'):
+            print("Not a fast scan, nothing to deconvolve")
+            return None
+
+        tcons = number('tcons')
+        if tcons is None:
+            raise ValueError("The scan parameters have no lock-in time constant (tcons), the lock-in was not connected when they were set")
+        slope = slope or number('slope')
+        if slope is None:
+            print(f"The scan parameters have no filter slope, assuming {cls.DEFAULT_SLOPE} dB/oct")
+            slope = cls.DEFAULT_SLOPE
+
+        bidir   = flag('bidir')
+        repeat  = max(int(float(values.get('repeat', 1) or 1)), 1) if bidir else 1
+        sweep   = 1 if float(values['end']) < float(values['start']) else -1  # t increases towards end
+        back    = repeat // 2  # Return sweeps of a bidirectional scan
+        return cls(tcons, slope, float(values['vel']), reg,
+                   direction=sweep * (repeat - 2 * back) / repeat, shifted=bidir)
+
+    @classmethod
+    def from_info(cls, file, reg=1e-3, slope=None):
+        """ From the info file saved with a scan """
+        return cls.from_params(pd.read_table(file, index_col=0).fillna(''), reg, slope)
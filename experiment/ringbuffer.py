@@ -0,0 +1,57 @@
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """ Bounded, thread safe buffer of fixed width float rows. When full, the oldest rows are
+    overwritten so the producer never blocks """
+    def __init__(self, capacity, width):
+        self._capacity = capacity
+        self._width    = width
+        self._data     = np.full((capacity, width), np.nan)
+        self._head     = 0  # Total rows pushed
+        self._tail     = 0  # Total rows drained (or dropped)
+        self._dropped  = 0
+        self._lock     = threading.Lock()
+
+    def __len__(self):
+        return self._head - self._tail
+
+    @property
+    def capacity(self): return self._capacity
+    @property
+    def width(self): return self._width
+    @property
+    def dropped(self): return self._dropped
+
+    def push(self, *row):
+        self.extend(np.array(row, ndmin=2))
+
+    def extend(self, rows):
+        rows = np.array(rows, dtype=float, ndmin=2)
+        with self._lock:
+            if len(rows) > self._capacity:
+                self._dropped += len(rows) - self._capacity
+                self._tail    += len(rows) - self._capacity
+                self._head    += len(rows) - self._capacity
+                rows = rows[-self._capacity:]
+            index = (self._head + np.arange(len(rows))) % self._capacity
+            self._data[index] = rows
+            self._head += len(rows)
+            overflow = self._head - self._tail - self._capacity
+            if overflow > 0:
+                self._dropped += overflow
+                self._tail    += overflow
+
+    def drain(self):
+        """ Returns all pending rows (oldest first) as a (n, width) array """
+        with self._lock:
+            index = np.arange(self._tail, self._head) % self._capacity
+            rows  = self._data[index]
+            self._tail = self._head
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._tail    = self._head
+            self._dropped = 0
@@ -0,0 +1,118 @@
+import os
+import json
+import time as tm
+import numpy as np
+import pandas as pd
+
+
+class StreamWriter:
+    """ Append-only binary data file written while scanning. A JSON header line with the column
+    names is followed by little endian float64 rows. Rows are flushed to disk every flush_rows
+    rows or flush_time seconds, so an interrupted scan is recoverable up to the last flush """
+    MAGIC = b'THZSTREAM1\n'
+
+    def __init__(self, path, columns, flush_rows=100, flush_time=1.):
+        self._path       = path
+        self._columns    = list(columns)
+        self._flush_rows = flush_rows
+        self._flush_time = flush_time
+        self._pending    = []
+        self._last_flush = tm.monotonic()
+        self._file       = open(path, 'wb')
+
+        header = json.dumps({'columns': self._columns}).encode() + b'\n'
+        self._file.write(self.MAGIC + header)
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def path(self): return self._path
+    @property
+    def columns(self): return self._columns
+
+    def write(self, rows):
+        rows = np.array(rows, dtype='<f8', ndmin=2)
+        self._pending.append(rows.reshape(-1, len(self._columns)))
+        pending = sum(len(chunk) for chunk in self._pending)
+        if pending >= self._flush_rows or tm.monotonic() - self._last_flush >= self._flush_time:
+            self.flush()
+
+    def flush(self):
+        for chunk in self._pending:
+            self._file.write(chunk.tobytes())
+        self._pending = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = tm.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    @classmethod
+    def read(cls, path):
+        """ Reads a (possibly interrupted) stream file, dropping any incomplete last row """
+        with open(path, 'rb') as file:
+            if file.readline() != cls.MAGIC:
+                raise ValueError(f"{path} is not a data stream file")
+            columns = json.loads(file.readline())['columns']
+            raw     = file.read()
+        n = len(raw) // (8 * len(columns))
+        values = np.frombuffer(raw[:n * 8 * len(columns)], dtype='<f8').reshape(n, len(columns))
+        return pd.DataFrame(values, columns=columns)
+
+
+class ColumnFile:
+    """ Binary columnar data file. A JSON header (columns, length and metadata such as the
+    parameter table), padded to a 64 byte boundary, is followed by each column stored
+    contiguously as little endian float64, so columns can be memory mapped without parsing """
+    MAGIC     = b'THZCOLS1\n'
+    EXTENSION = '.bin'
+    ALIGN     = 64
+
+    @classmethod
+    def is_column_file(cls, path):
+        with open(path, 'rb') as file:
+            return file.read(len(cls.MAGIC)) == cls.MAGIC
+
+    @classmethod
+    def write(cls, path, data, meta=None):
+        columns = list(data.columns)
+        header  = json.dumps({'columns': columns, 'length': len(data), 'meta': meta or {}},
+                             default=str).encode() + b'\n'
+        size    = len(cls.MAGIC) + len(header)
+        header += b' ' * (-size % cls.ALIGN)
+
+        with open(path, 'wb') as file:
+            file.write(cls.MAGIC + header)
+            for column in columns:
+                file.write(np.ascontiguousarray(data[column], dtype='<f8').tobytes())
+
+    @classmethod
+    def read_header(cls, path):
+        """ Returns the header dict and the byte offset of the first column """
+        with open(path, 'rb') as file:
+            if file.readline() != cls.MAGIC:
+                raise ValueError(f"{path} is not a column data file")
+            header = json.loads(file.readline())
+            offset = file.tell()
+        return header, offset + (-offset % cls.ALIGN)
+
+    @classmethod
+    def read(cls, path, mmap=True):
+        """ Returns the data as a DataFrame whose columns are views of a memory map of the file
+        (or of an in-memory copy if mmap is False), and the metadata dict """
+        header, offset = cls.read_header(path)
+        shape  = (len(header['columns']), header['length'])
+        if mmap:
+            values = np.memmap(path, dtype='<f8', mode='r', offset=offset, shape=shape)
+        else:
+            values = np.fromfile(path, dtype='<f8', offset=offset).reshape(shape)
+        data = pd.DataFrame(dict(zip(header['columns'], values)), copy=False)
+        return data, header['meta']
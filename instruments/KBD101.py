@@ -2,19 +2,22 @@ import tkinter as tk
 from tkinter import ttk
 import time as tm
 import sys
-import clr
-from System import String
-from System import Decimal
-from System.Collections import *
+try:
+    import clr
+    from System import String
+    from System import Decimal
+    from System.Collections import *
 
-if not r'C:\Program Files\Thorlabs\Kinesis' in sys.path:
-    sys.path.append(r'C:\Program Files\Thorlabs\Kinesis')
-    
-clr.AddReference("Thorlabs.MotionControl.DeviceManagerCLI")
-from Thorlabs.MotionControl.DeviceManagerCLI import DeviceManagerCLI
+    if not r'C:\Program Files\Thorlabs\Kinesis' in sys.path:
+        sys.path.append(r'C:\Program Files\Thorlabs\Kinesis')
+
+    clr.AddReference("Thorlabs.MotionControl.DeviceManagerCLI")
+    from Thorlabs.MotionControl.DeviceManagerCLI import DeviceManagerCLI
 
-clr.AddReference("Thorlabs.MotionControl.KCube.BrushlessMotorCLI")
-from Thorlabs.MotionControl.KCube.BrushlessMotorCLI import KCubeBrushlessMotor
+    clr.AddReference("Thorlabs.MotionControl.KCube.BrushlessMotorCLI")
+    from Thorlabs.MotionControl.KCube.BrushlessMotorCLI import KCubeBrushlessMotor
+except ImportError:
+    print("Thorlabs Kinesis is not available, KBD101 delay lines cannot be connected")
 
 
 class KBD101:
@@ -176,6 +179,9 @@ class KBD101:
         self.set_vel(100)
         self.move_to(pos, timeout)
         
+    def is_moving(self):
+        return bool(self._device.Status.IsMoving)
+
     def request_pos(self):
         self._device.RequestPosition()
         
@@ -186,6 +192,10 @@ class KBD101:
     def get_vel(self):
         vel = str(self._device.GetVelocityParams().MaxVelocity).replace(',', '.')
         return float(vel)
+
+    def get_acc(self):
+        acc = str(self._device.GetVelocityParams().Acceleration).replace(',', '.')
+        return float(acc)
     
     def set_vel(self, vel, acceleration=999):
         self._device.SetVelocityParams(Decimal(vel), Decimal(acceleration))
\ No newline at end of file
@@ -3,3 +3,4 @@ from .lockin import Lockin
 from .multimeter import Multimeter
 from .cernox import Cernox
 from .KBD101 import KBD101
+from .simulated import SimSR830, SimDMM, SimKBD101, pulse_source
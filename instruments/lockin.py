@@ -1,3 +1,4 @@
+import numpy as np
 from instruments import VISAInstrument
 
 
@@ -40,12 +41,105 @@ class Lockin(VISAInstrument):
         '19': 30e3
     }
 
+    # first col: lock-in index; second col: buffer sample rates in Hz (index 14 is external trigger)
+    SRAT_LIST = {
+        '0':  62.5e-3,
+        '1':  125e-3,
+        '2':  250e-3,
+        '3':  500e-3,
+        '4':  1,
+        '5':  2,
+        '6':  4,
+        '7':  8,
+        '8':  16,
+        '9':  32,
+        '10': 64,
+        '11': 128,
+        '12': 256,
+        '13': 512
+    }
+
+    # first col: lock-in index; second col: low pass filter slope in dB/oct
+    SLOPE_LIST = {
+        '0': 6,
+        '1': 12,
+        '2': 18,
+        '3': 24
+    }
+
+    # first col: low pass filter slope in dB/oct; second col: 99% settling time in tcons
+    SETTLE_LIST = {
+        6:  5,
+        12: 7,
+        18: 9,
+        24: 10
+    }
+
+    # first col: output name; second col: SNAP? parameter index
+    SNAP_LIST = {
+        'X':     1,
+        'Y':     2,
+        'R':     3,
+        'theta': 4,
+        'AUX1':  5,
+        'AUX2':  6,
+        'AUX3':  7,
+        'AUX4':  8,
+        'freq':  9,
+        'CH1':   10,
+        'CH2':   11
+    }
+    SNAP_MAX = 6  # Parameters per SNAP? query
+
+    BUFFER_SIZE = 16383  # Points per channel in the SR830 storage buffer
+
+    # Cached settings and the query that reads each of them
+    SETTINGS = {'sens': 'SENS?', 'tcons': 'OFLT?', 'slope': 'OFSL?', 'freq': 'FREQ?', 'phase': 'PHAS?'}
+
     def __init__(self, name="Lock-in"):
         super().__init__(name)
+        self._settings = {}  # Raw responses of the SETTINGS queries
+
+    def refresh(self, *keys):
+        """ Reads the given settings (all if none given) in a single multi-command query """
+        keys      = keys or tuple(self.SETTINGS)
+        queries   = [self.SETTINGS[key] for key in keys]
+        self.instr.write(';'.join(queries))
+        responses = self.instr.read().split(';')
+        while len(responses) < len(queries):  # Responses may also come one per line
+            responses += self.instr.read().split(';')
+        self._settings.update({key: response.strip() for key, response in zip(keys, responses)})
+
+    def invalidate(self, *keys):
+        """ Drops the given cached settings (all if none given) """
+        for key in keys or tuple(self.SETTINGS):
+            self._settings.pop(key, None)
+
+    def _setting(self, key):
+        if key not in self._settings:
+            self._settings[key] = self.instr.query(self.SETTINGS[key]).strip()
+        return self._settings[key]
+
+    def connect(self):
+        self.invalidate()
+        super().connect()
+
+    def connect_resource(self, resource, address=None):
+        self.invalidate()
+        super().connect_resource(resource, address)
+
+    def snap(self, *channels):
+        """ Reads up to SNAP_MAX outputs of SNAP_LIST at the same instant in a single query """
+        unknown = [ch for ch in channels if ch not in self.SNAP_LIST]
+        if unknown or not 0 < len(channels) <= self.SNAP_MAX:
+            raise ValueError(f"SNAP? takes 1 to {self.SNAP_MAX} of {', '.join(self.SNAP_LIST)}, got {', '.join(channels)}")
+        indexes = [str(self.SNAP_LIST[ch]) for ch in channels]
+        if len(indexes) == 1: indexes *= 2  # SNAP? needs at least two parameters
+        values = self.instr.query(f"SNAP?{','.join(indexes)}").split(',')
+        return tuple(float(value) for value in values[:len(channels)])
 
     def get_XY(self):
-        X, Y = self.instr.query('SNAP?1,2').split(',')
-        return float(X), float(Y)
+        return self.snap('X', 'Y')
 
     def get_X(self):
         X = self.instr.query('OUTP?1')
@@ -56,19 +150,80 @@ class Lockin(VISAInstrument):
         return float(Y)
 
     def get_phase(self):
-        phase = self.instr.query('PHAS?')
-        return float(phase)
+        return float(self._setting('phase'))
 
     def get_freq(self):
-        freq = self.instr.query('FREQ?')
-        return float(freq)
+        return float(self._setting('freq'))
 
     def get_sens(self):
         """ Returns 0 if sensitivity out of range """
-        i = self.instr.query('SENS?')
+        i = self._setting('sens')
         return self.SENS_LIST[i] if i in self.SENS_LIST else 0
 
     def get_tcons(self):
-        i = self.instr.query('OFLT?')
-        return self.TCONS_LIST[i]
-    
\ No newline at end of file
+        return self.TCONS_LIST[self._setting('tcons')]
+
+    def get_slope(self):
+        return self.SLOPE_LIST[self._setting('slope')]
+
+    def get_settle(self):
+        """ Time in s for the outputs to settle within 1% of a step input """
+        return self.SETTLE_LIST[self.get_slope()] * self.get_tcons()
+
+    def set_phase(self, phase):
+        self.instr.write(f'PHAS {phase}')
+        self.invalidate('phase')
+
+    def set_sens(self, sens):
+        """ Sets the sensitivity (in nA) closest to sens """
+        i = min(self.SENS_LIST, key=lambda i: abs(self.SENS_LIST[i] - sens))
+        self.instr.write(f'SENS {i}')
+        self.invalidate('sens')
+
+    def set_tcons(self, tcons):
+        """ Sets the time constant (in s) closest to tcons """
+        i = min(self.TCONS_LIST, key=lambda i: abs(self.TCONS_LIST[i] - tcons))
+        self.instr.write(f'OFLT {i}')
+        self.invalidate('tcons')
+
+    def set_slope(self, slope):
+        """ Sets the low pass filter slope closest to slope (in dB/oct) """
+        i = min(self.SLOPE_LIST, key=lambda i: abs(self.SLOPE_LIST[i] - slope))
+        self.instr.write(f'OFSL {i}')
+        self.invalidate('slope')
+
+    def set_srate(self, rate):
+        """ Sets the highest buffer sample rate not above rate (in Hz) and returns it """
+        valid = [i for i in self.SRAT_LIST if self.SRAT_LIST[i] <= rate] or ['0']
+        i = max(valid, key=lambda i: self.SRAT_LIST[i])
+        self.instr.write(f'SRAT {i}')
+        return self.SRAT_LIST[i]
+
+    def buffer_setup(self, rate):
+        """ Resets the buffer to store X (CH1) and Y (CH2) in single shot mode """
+        self.instr.write('REST')
+        self.instr.write('DDEF 1,0,0')
+        self.instr.write('DDEF 2,0,0')
+        self.instr.write('SEND 0')
+        self.instr.write('TSTR 0')
+        return self.set_srate(rate)
+
+    def buffer_start(self):
+        self.instr.write('STRT')
+
+    def buffer_pause(self):
+        self.instr.write('PAUS')
+
+    def buffer_reset(self):
+        self.instr.write('REST')
+
+    def buffer_count(self):
+        return int(self.instr.query('SPTS?'))
+
+    def read_buffer(self, channel, start, count):
+        """ Bulk reads count points of the buffer channel (1: X, 2: Y) as little endian floats """
+        if count <= 0: return np.array([])
+        return self.instr.query_binary_values(f'TRCB?{channel},{start},{count}', datatype='f',
+                                              is_big_endian=False, header_fmt='empty',
+                                              expect_termination=False, data_points=count,
+                                              container=np.array)
@@ -0,0 +1,381 @@
+import math
+import threading
+import time as tm
+import numpy as np
+from instruments.trajectory import Trajectory
+
+
+class SimResource:
+    """ Stand-in for a pyvisa resource. Commands are dispatched to methods named after them
+    (e.g. 'OUTP?1' calls cmd_outp_q('1') and 'SENS 20' calls cmd_sens('20')) and every write sleeps
+    for the command latency, so timings behave like the real bus. Several commands may be sent
+    on one line separated by ';' at the cost of a single round trip """
+    IDN = "Simulated instrument"
+
+    def __init__(self, latency=.005, latencies=None, jitter=0.):
+        self.read_termination  = '\n'
+        self.write_termination = '\n'
+        self._latency   = latency
+        self._latencies = latencies or {}
+        self._jitter    = jitter
+        self._responses = []
+        self._busy      = 0.
+        self._lock      = threading.RLock()
+
+    def __repr__(self):
+        return f"<{type(self).__name__}>"
+
+    @staticmethod
+    def _parse(command):
+        if '?' in command:
+            name, args = command.split('?', 1)
+            name += '?'
+        else:
+            name, _, args = command.partition(' ')
+        return name.strip().upper(), [arg.strip() for arg in args.split(',') if arg.strip()]
+
+    def _handler(self, name):
+        method = 'cmd_' + name.lstrip('*').replace(':', '_').replace('?', '_q').lower()
+        if not hasattr(self, method):
+            raise ValueError(f"{type(self).__name__} does not understand {name}")
+        return getattr(self, method)
+
+    @property
+    def busy(self): return self._busy
+
+    def reset_busy(self):
+        self._busy = 0.
+
+    def _delay(self, names, extra=0.):
+        latency = max(self._latencies.get(name, self._latency) for name in names)
+        jitter  = np.random.exponential(self._jitter) if self._jitter else 0.
+        self._busy += latency + jitter + extra
+        tm.sleep(latency + jitter + extra)
+
+    def write(self, message):
+        with self._lock:
+            names = []
+            for command in message.split(';'):
+                if not command.strip(): continue
+                name, args = self._parse(command)
+                response   = self._handler(name)(*args)
+                if name.endswith('?'): self._responses.append(response)
+                names.append(name)
+            if names: self._delay(names, self._transfer_time())
+
+    def read(self):
+        with self._lock:
+            return str(self._responses.pop(0))
+
+    def query(self, message):
+        with self._lock:
+            self.write(message)
+            return self.read()
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False, container=list, **kwargs):
+        with self._lock:
+            self.write(message)
+            raw = self._responses.pop(0)
+        values = np.frombuffer(raw, dtype=('>' if is_big_endian else '<') + datatype)
+        return container(values)
+
+    def close(self):
+        pass
+
+    def _transfer_time(self):
+        return 0.
+
+    def cmd_idn_q(self):
+        return self.IDN
+
+
+class SimSR830(SimResource):
+    """ Simulated SR830 lock-in. source(t) returns the (X, Y) input signal in A at the
+    perf_counter times t (arrays), and the outputs are that signal filtered by the output low
+    pass (time constant and slope) plus gaussian noise. The storage buffer samples X and Y at
+    the set rate from STRT on, or on every TRIG when the rate is set to trigger (index 14) """
+    IDN       = "Stanford_Research_Systems,SR830,SIM,ver1.07"
+    BANDWIDTH = 100e3  # Binary transfer rate in bytes/s
+
+    TCONS_S = [10e-6 * 10**(i // 2) * [1, 3][i % 2] for i in range(20)]
+    SRAT_HZ = [62.5e-3 * 2**i for i in range(14)]
+
+    def __init__(self, source=None, noise=0., freq=1000., latency=.005, latencies=None, jitter=0.):
+        latencies = {'OUTP?': .004, 'SNAP?': .006, 'SPTS?': .003, 'TRCB?': .005, **(latencies or {})}
+        super().__init__(latency, latencies, jitter)
+        self._source  = source or (lambda t: (np.zeros_like(t), np.zeros_like(t)))
+        self._noise   = noise
+        self._freq    = freq
+        self._phase   = 0.
+        self._sens    = 20
+        self._oflt    = 8
+        self._ofsl    = 1
+        self._srat    = 10
+        self._send    = 0
+        self._aux     = [0., 0., 0., 0.]
+        self._display = [0, 0]
+        self._transfer = 0
+        self._buffer_reset()
+
+    def set_source(self, source):
+        self._source = source
+
+    @property
+    def tcons(self): return self.TCONS_S[self._oflt]
+    @property
+    def order(self): return self._ofsl + 1
+
+    def _filter(self, t):
+        """ X and Y outputs at the times t: the source convolved with the impulse response of
+        order cascaded RC stages of time constant tcons """
+        t   = np.atleast_1d(np.asarray(t, dtype=float))
+        T   = self.tcons
+        n   = self.order
+        tau = (np.arange(20 * (n + 8)) + .5) * T / 20  # Lag grid covering the response
+        h   = tau**(n - 1) * np.exp(-tau / T)
+        h  /= h.sum()
+        X, Y = self._source(t[:, None] - tau[None, :])
+        X = (np.asarray(X) * h).sum(axis=1) + self._noise * np.random.randn(len(t))
+        Y = (np.asarray(Y) * h).sum(axis=1) + self._noise * np.random.randn(len(t))
+        return X, Y
+
+    def _outputs(self, t=None):
+        X, Y = self._filter(tm.perf_counter() if t is None else t)
+        R    = np.hypot(X, Y)
+        th   = np.degrees(np.arctan2(Y, X))
+        return X, Y, R, th
+
+    def _format(self, value):
+        return f"{float(value):.6g}"
+
+    def _value(self, index, outputs):
+        X, Y, R, th = outputs
+        channels = {1: X[0], 2: Y[0], 3: R[0], 4: th[0], 9: self._freq,
+                    10: [X, R][self._display[0] % 2][0], 11: [Y, th][self._display[1] % 2][0]}
+        if 5 <= index <= 8: return self._aux[index - 5]
+        return channels[index]
+
+    def cmd_outp_q(self, i):
+        return self._format(self._value(int(i), self._outputs()))
+
+    def cmd_snap_q(self, *indexes):
+        outputs = self._outputs()
+        return ','.join(self._format(self._value(int(i), outputs)) for i in indexes)
+
+    def cmd_phas_q(self): return self._format(self._phase)
+    def cmd_phas(self, x): self._phase = float(x)
+    def cmd_freq_q(self): return self._format(self._freq)
+    def cmd_sens_q(self): return str(self._sens)
+    def cmd_sens(self, i): self._sens = int(i)
+    def cmd_oflt_q(self): return str(self._oflt)
+    def cmd_oflt(self, i): self._oflt = int(i)
+    def cmd_ofsl_q(self): return str(self._ofsl)
+    def cmd_ofsl(self, i): self._ofsl = int(i)
+    def cmd_srat_q(self): return str(self._srat)
+    def cmd_srat(self, i): self._srat = int(i)
+    def cmd_send_q(self): return str(self._send)
+    def cmd_send(self, i): self._send = int(i)
+    def cmd_tstr(self, i): pass
+    def cmd_ddef(self, channel, j, k=0): self._display[int(channel) - 1] = int(j)
+    def cmd_oaux_q(self, i): return self._format(self._aux[int(i) - 1])
+
+    # Storage buffer #########################################################
+    def _buffer_reset(self):
+        self._buf_start  = None    # Start time of a running (or paused) buffer
+        self._buf_pause  = None
+        self._buf_triggs = []      # Sample times in trigger mode
+        self._buf_X      = np.array([])
+        self._buf_Y      = np.array([])
+
+    def _buffer_times(self):
+        if self._srat == 14:
+            times = np.array(self._buf_triggs)
+        elif self._buf_start is None:
+            times = np.array([])
+        else:
+            now   = self._buf_pause if self._buf_pause is not None else tm.perf_counter()
+            rate  = self.SRAT_HZ[self._srat]
+            times = self._buf_start + np.arange(int((now - self._buf_start) * rate) + 1) / rate
+        return times[:16383]
+
+    def _buffer_fill(self, count):
+        done = len(self._buf_X)
+        if count > done:
+            X, Y = self._filter(self._buffer_times()[done:count])
+            self._buf_X = np.append(self._buf_X, X)
+            self._buf_Y = np.append(self._buf_Y, Y)
+
+    def cmd_rest(self): self._buffer_reset()
+
+    def cmd_strt(self):
+        if self._buf_pause is not None:  # Resume keeping the sample grid
+            self._buf_start += tm.perf_counter() - self._buf_pause
+            self._buf_pause  = None
+        elif self._buf_start is None:
+            self._buf_start = tm.perf_counter()
+
+    def cmd_paus(self):
+        if self._buf_start is not None and self._buf_pause is None:
+            self._buf_pause = tm.perf_counter()
+
+    def cmd_trig(self):
+        if self._srat == 14 and len(self._buf_triggs) < 16383:
+            self._buf_triggs.append(tm.perf_counter())
+
+    def cmd_spts_q(self):
+        return str(len(self._buffer_times()))
+
+    def cmd_trcb_q(self, channel, start, count):
+        start, count = int(start), int(count)
+        if start + count > len(self._buffer_times()):
+            raise ValueError("TRCB? asked for points not yet stored in the buffer")
+        self._buffer_fill(start + count)
+        values = [self._buf_X, self._buf_Y][int(channel) - 1][start:start + count]
+        self._transfer = 4 * count
+        return np.asarray(values, dtype='<f4').tobytes()
+
+    def _transfer_time(self):
+        transfer, self._transfer = self._transfer, 0
+        return transfer / self.BANDWIDTH
+
+
+class SimDMM(SimResource):
+    """ Simulated multimeter reading a resistance that drifts by drift ohm/s around value """
+    IDN = "Simulated,DMM,SIM,1.0"
+
+    def __init__(self, value=1000., drift=0., noise=0., latency=.02, latencies=None, jitter=0.):
+        latencies = {'MEAS:FRES?': .25, 'MEAS:RES?': .12, **(latencies or {})}
+        super().__init__(latency, latencies, jitter)
+        self._value = value
+        self._drift = drift
+        self._noise = noise
+        self._t0    = tm.perf_counter()
+
+    def _reading(self):
+        value = self._value + self._drift * (tm.perf_counter() - self._t0)
+        return f"{value + self._noise * np.random.randn():.8g}"
+
+    def cmd_meas_q(self): return self._reading()
+    def cmd_meas_curr_q(self): return self._reading()
+    def cmd_meas_fres_q(self): return self._reading()
+    def cmd_meas_res_q(self): return self._reading()
+
+
+class SimKBD101:
+    """ Simulated KBD101 delay line with the KBD101 interface. Moves follow a trapezoidal
+    velocity profile and, like the real device, get_pos returns the position of the last
+    polling update (or of the last request_pos when not polling) """
+    def __init__(self, default_serial="28000000", position=0., latency=.001):
+        self._default_serial = default_serial
+        self._latency        = latency
+        self._busy           = 0.
+        self._connected      = False
+        self._vel            = 100.
+        self._acc            = 999.
+        self._polling        = 0
+        self._poll_start     = None
+        self._move_start     = tm.perf_counter()
+        self._trajectory     = Trajectory(position, position, self._vel, self._acc)
+        self._reported       = position
+
+    @property
+    def is_connected(self): return self._connected
+    @property
+    def trajectory(self): return self._trajectory
+    @property
+    def busy(self): return self._busy
+
+    def reset_busy(self):
+        self._busy = 0.
+
+    def position_at(self, t):
+        """ True stage position at the perf_counter times t """
+        return self._trajectory.position(np.asarray(t) - self._move_start)
+
+    def is_moving(self):
+        return tm.perf_counter() - self._move_start < self._trajectory.duration
+
+    def create_widget(self, frame, row):
+        print("Simulated delay line has no widget")
+
+    def widget_enable(self): pass
+    def widget_disable(self): pass
+
+    def connect(self, manual_serial=None):
+        self._connected = True
+        print(f"Connected simulated delay line (serial no. {manual_serial or self._default_serial})")
+
+    def disconnect(self):
+        self._connected = False
+        print("Disconnected the simulated delay line")
+
+    def get_info(self):
+        return {'deviceName': 'Simulated KBD101', 'deviceSerial': self._default_serial,
+                'stageName': 'Simulated stage', 'stageSerial': '0'}
+
+    def enable(self): pass
+    def disable(self): pass
+
+    def start_polling(self, rate=50):
+        self._polling    = rate
+        self._poll_start = tm.perf_counter()
+
+    def stop_polling(self):
+        self._reported = float(self.position_at(self._last_poll()))
+        self._polling  = 0
+
+    def get_polling_rate(self):
+        return self._polling
+
+    def _last_poll(self):
+        now = tm.perf_counter()
+        if not self._polling: return now
+        period = self._polling / 1e3
+        return self._poll_start + math.floor((now - self._poll_start) / period) * period
+
+    def home(self, polling_rate=50, timeout=60000):
+        self.move_to(0, timeout)
+
+    def move_to(self, pos, timeout=60000):
+        self._busy += self._latency
+        tm.sleep(self._latency)
+        now = tm.perf_counter()
+        self._trajectory = Trajectory(float(self.position_at(now)), float(pos), self._vel, self._acc)
+        self._move_start = now
+        if timeout:
+            tm.sleep(min(self._trajectory.duration, timeout / 1e3))
+
+    def return_to(self, pos, timeout=60000):
+        self.set_vel(100)
+        self.move_to(pos, timeout)
+
+    def request_pos(self):
+        self._reported = float(self.position_at(tm.perf_counter()))
+
+    def get_pos(self):
+        self._busy += self._latency
+        tm.sleep(self._latency)
+        if self._polling: return float(self.position_at(self._last_poll()))
+        return self._reported
+
+    def get_vel(self):
+        return self._vel
+
+    def get_acc(self):
+        return self._acc
+
+    def set_vel(self, vel, acceleration=999):
+        self._vel = float(vel)
+        self._acc = float(acceleration)
+
+
+def pulse_source(delay_line, center, amplitude=1e-9, width=.5):
+    """ Lock-in source of a single cycle THz pulse (derivative of a gaussian of the given
+    width in ps and peak amplitude in A) at the delay line position center (mm) """
+    C = 299_792_458e3/1e12  # mm/ps
+
+    def source(t):
+        tau = 2 * (center - delay_line.position_at(t)) / C / width
+        X   = -amplitude * tau * np.exp(.5 - .5 * tau**2)
+        return X, np.zeros_like(X)
+    return source
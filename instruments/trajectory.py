@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class Trajectory:
+    """ Trapezoidal velocity profile of a point to point move. Positions in mm, velocity in mm/s,
+    acceleration in mm/s^2 and times in s since the start of the move """
+    def __init__(self, start, end, vel, acc):
+        self._start = float(start)
+        self._end   = float(end)
+        self._sign  = 1. if end >= start else -1.
+        self._acc   = float(acc)
+
+        distance = abs(self._end - self._start)
+        t_acc    = vel / acc
+        d_acc    = vel**2 / (2 * acc)
+        if 2 * d_acc > distance:  # Triangular profile, the set velocity is never reached
+            t_acc = np.sqrt(distance / acc)
+            d_acc = distance / 2
+            vel   = acc * t_acc
+
+        self._vel      = vel
+        self._t_acc    = t_acc
+        self._d_acc    = d_acc
+        self._t_flat   = (distance - 2 * d_acc) / vel if vel else 0.
+        self._distance = distance
+
+    def __repr__(self):
+        return f"Trajectory {self.start}mm to {self.end}mm @ {self.vel:.3g}mmps in {self.duration:.3g}s"
+
+    @property
+    def start(self): return self._start
+    @property
+    def end(self): return self._end
+    @property
+    def vel(self): return self._vel
+    @property
+    def acc(self): return self._acc
+    @property
+    def t_acc(self): return self._t_acc
+    @property
+    def t_flat(self): return self._t_flat
+    @property
+    def ramp(self): return self._d_acc
+    @property
+    def duration(self): return 2 * self._t_acc + self._t_flat
+
+    def distance(self, t):
+        t  = np.clip(t, 0, self.duration)
+        t1 = self._t_acc
+        t2 = self._t_acc + self._t_flat
+        return np.where(t < t1, .5 * self._acc * t**2,
+               np.where(t < t2, self._d_acc + self._vel * (t - t1),
+                        self._distance - .5 * self._acc * (self.duration - t)**2))
+
+    def position(self, t):
+        return self._start + self._sign * self.distance(t)
+
+    def velocity(self, t):
+        t  = np.clip(t, 0, self.duration)
+        t1 = self._t_acc
+        t2 = self._t_acc + self._t_flat
+        speed = np.where(t < t1, self._acc * t,
+                np.where(t < t2, self._vel, self._acc * (self.duration - t)))
+        return self._sign * speed
+
+
+class ScanPlan:
+    """ Constant velocity sweep from start to end. The stage is pre-positioned beyond start by its
+    acceleration ramp plus a margin (mm) and driven as far beyond end, so the whole start to end
+    window is crossed at the set velocity. Times are in s since the start of the move """
+    def __init__(self, start, end, vel, acc, margin=0.):
+        self._start  = float(start)
+        self._end    = float(end)
+        self._sign   = 1. if end >= start else -1.
+        self._vel    = float(vel)
+        self._margin = float(margin)
+
+        run_up = vel**2 / (2 * acc) + margin
+        self._trajectory = Trajectory(self._start - self._sign * run_up, self._end + self._sign * run_up, vel, acc)
+
+    def __repr__(self):
+        return (f"ScanPlan {self.start}mm to {self.end}mm @ {self.vel:.3g}mmps, "
+                f"run-up from {self.pre:.4g}mm, window {self.t_in:.3g}s to {self.t_out:.3g}s")
+
+    @property
+    def start(self): return self._start
+    @property
+    def end(self): return self._end
+    @property
+    def vel(self): return self._vel
+    @property
+    def direction(self): return self._sign
+    @property
+    def trajectory(self): return self._trajectory
+    @property
+    def pre(self): return self._trajectory.start
+    @property
+    def post(self): return self._trajectory.end
+    @property
+    def t_in(self): return self._trajectory.t_acc + self._margin / self._vel
+    @property
+    def window(self): return abs(self._end - self._start) / self._vel
+    @property
+    def t_out(self): return self.t_in + self.window
+
+    def passed(self, pos):
+        """ Whether pos is at or beyond end in the sweep direction """
+        return (pos - self._end) * self._sign >= 0
+
+    def points(self, rate):
+        """ Number of samples at rate (Hz) inside the window, both ends included """
+        return int(self.window * rate) + 1
+
+    def times(self, rate):
+        """ Uniform sample times at rate (Hz) inside the window """
+        return self.t_in + np.arange(self.points(rate)) / rate
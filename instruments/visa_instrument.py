@@ -1,4 +1,9 @@
 import os
+import atexit
+import threading
+import time as tm
+import numpy as np
+import pandas as pd
 import pyvisa as pv
 import tkinter as tk
 from tkinter import ttk
@@ -27,6 +32,8 @@ class VISAInstrument:
         else:          return "No instrument"
     @property
     def is_connected(self): return True if self.instr else False
+    @property
+    def is_profiling(self): return isinstance(self.instr, ProfiledResource)
     
     def _save_preset(self):
         if not os.path.exists(self.PRESET_FOLDER): os.makedirs(self.PRESET_FOLDER)
@@ -43,19 +50,23 @@ class VISAInstrument:
             print(f"No {self.name} address found in preset folder")
 
     def create_widget(self, frame, row):
-        rm = pv.ResourceManager()
-        self._widget = InstrWidget(frame, row, self, rm.list_resources())
+        self._widget = InstrWidget(frame, row, self, ResourcePool.list_resources())
         print(f"{self.name} widget successfully created")
         self._load_preset()
 
     def set_address(self, address):
         self._address = address
 
+    def widget_enable(self):
+        if self._widget: self._widget.enable()
+
+    def widget_disable(self):
+        if self._widget: self._widget.disable()
+
     def connect(self):
-        rm = pv.ResourceManager()
         if self._address:
             try:
-                self._instr = rm.open_resource(self._address)
+                self._instr = ResourcePool.open(self._address)
                 self.instr.read_termination  = '\n'
                 self.instr.write_termination = '\n'
                 print(f"Connected {self.name}: {self.idn} ({self.instr})")
@@ -64,11 +75,43 @@ class VISAInstrument:
                 print(f"Failed to connect the {self.name}")
         else:
             print(f"Failed to connect the {self.name}. You must specify a VISA address within:")
-            print(rm.list_resources())
+            print(ResourcePool.list_resources(refresh=True))
+
+    def connect_resource(self, resource, address=None):
+        """ Uses an already opened resource, e.g. a simulated one """
+        self._address = address or repr(resource)
+        self._instr   = resource
+        print(f"Connected {self.name}: {self.idn} ({self.instr})")
+
+    def enable_profiling(self):
+        """ Starts recording the latency of every command sent to the instrument """
+        if self.instr and not self.is_profiling:
+            self._instr = ProfiledResource(self.instr)
+        elif self.is_profiling:
+            self.instr.reset()
+
+    def disable_profiling(self):
+        if self.is_profiling:
+            self._instr = self.instr.resource
+
+    def latency_table(self):
+        """ Count, mean, p50, p99 and max latency (ms) and total time (s) per command """
+        return self.instr.table() if self.is_profiling else ProfiledResource.empty_table()
+
+    def log_latency(self, file=None):
+        table = self.latency_table()
+        if file:
+            with open(file, 'a') as f:
+                f.write(f"# {self.name} VISA latency {tm.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                table.to_csv(f, sep='\t')
+        print(f"{self.name} VISA latency:")
+        print(table)
 
     def disconnect(self):
+        """ Releases the session to the pool, which keeps it open for the next connect """
         try:
-            self.instr.close()
+            self.disable_profiling()
+            ResourcePool.release(self.address, self.instr)
             print(f"Disconnected the {self.name} ({self.instr})")
             self._instr   = None
             self._address = None
@@ -76,6 +119,144 @@ class VISAInstrument:
             print(f"Failed to disconnect the {self.name} ({self.instr})")
 
 
+class ResourcePool:
+    """ Process wide pyvisa ResourceManager. The resource enumeration (slow on GPIB/USB) is
+    cached until refreshed, and sessions are kept open across connect/disconnect cycles """
+    _manager   = None
+    _resources = None
+    _sessions  = {}
+    _lock      = threading.RLock()
+
+    @classmethod
+    def manager(cls):
+        with cls._lock:
+            if cls._manager is None:
+                cls._manager = pv.ResourceManager()
+                atexit.register(cls.close_all)
+            return cls._manager
+
+    @classmethod
+    def list_resources(cls, refresh=False):
+        with cls._lock:
+            if cls._resources is None or refresh:
+                cls._resources = cls.manager().list_resources()
+            return cls._resources
+
+    @classmethod
+    def open(cls, address):
+        with cls._lock:
+            session = cls._sessions.get(address)
+            if session is not None and cls._is_open(session):
+                return session
+            session = cls.manager().open_resource(address)
+            cls._sessions[address] = session
+            return session
+
+    @classmethod
+    def release(cls, address, resource):
+        """ Pooled sessions stay open, anything else (e.g. simulated resources) is closed """
+        with cls._lock:
+            if cls._sessions.get(address) is not resource:
+                resource.close()
+
+    @classmethod
+    def close(cls, address):
+        with cls._lock:
+            session = cls._sessions.pop(address, None)
+            if session is not None: session.close()
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            for address in list(cls._sessions):
+                try:
+                    cls.close(address)
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _is_open(session):
+        try:
+            session.session  # Raises once the session has been closed
+            return True
+        except Exception:
+            return False
+
+
+class ProfiledResource:
+    """ Wraps a pyvisa resource, timing every call and grouping the latencies by command
+    header (e.g. 'SNAP?1,2' and 'SNAP?1,2,3' both count as 'SNAP?') """
+    def __init__(self, resource):
+        self.__dict__['_resource']  = resource
+        self.__dict__['_latencies'] = {}
+        self.__dict__['_lock']      = threading.Lock()
+
+    def __repr__(self):
+        return repr(self._resource)
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resource, name, value)
+
+    @property
+    def resource(self): return self._resource
+
+    @staticmethod
+    def header(message):
+        names = []
+        for command in message.split(';'):
+            command = command.strip()
+            names.append(command[:command.index('?') + 1] if '?' in command else command.split(' ')[0])
+        return ';'.join(names)
+
+    def _timed(self, command, func, *args, **kwargs):
+        t0 = tm.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latency = tm.perf_counter() - t0
+            with self._lock:
+                self._latencies.setdefault(command, []).append(latency)
+
+    def query(self, message, *args, **kwargs):
+        return self._timed(self.header(message), self._resource.query, message, *args, **kwargs)
+
+    def write(self, message, *args, **kwargs):
+        return self._timed(self.header(message), self._resource.write, message, *args, **kwargs)
+
+    def read(self, *args, **kwargs):
+        return self._timed('read', self._resource.read, *args, **kwargs)
+
+    def query_binary_values(self, message, *args, **kwargs):
+        return self._timed(self.header(message), self._resource.query_binary_values, message, *args, **kwargs)
+
+    def latencies(self):
+        """ Copy of the recorded latencies (s) per command """
+        with self._lock:
+            return {command: np.array(values) for command, values in self._latencies.items()}
+
+    def histogram(self, command, bins=20):
+        return np.histogram(self.latencies()[command] * 1e3, bins=bins)
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+
+    @staticmethod
+    def empty_table():
+        return pd.DataFrame(columns=['count', 'mean', 'p50', 'p99', 'max', 'total'])
+
+    def table(self):
+        rows = {}
+        for command, values in self.latencies().items():
+            ms = values * 1e3
+            rows[command] = {'count': len(ms), 'mean': ms.mean(), 'p50': np.percentile(ms, 50),
+                             'p99': np.percentile(ms, 99), 'max': ms.max(), 'total': values.sum()}
+        return pd.DataFrame.from_dict(rows, orient='index') if rows else self.empty_table()
+
+
 class InstrWidget:
     def __init__(self, frame, row, instrument, address_list=[]):
         self._instrument = instrument
@@ -83,11 +264,13 @@ class InstrWidget:
         self._label  = ttk.Label(frame, text=f"{self._instrument.name}:", width=10)
         self._combo  = ttk.Combobox(frame, values=address_list, width=40)
         self._button = ttk.Button(frame, text="Connect", command=self._button_clicked)
+        self._reload = ttk.Button(frame, text="Refresh", command=self._refresh_clicked)
 
         options = {'sticky': tk.W, 'padx': 5, 'pady': 5}
         self._label.grid(row=row, column=0, **options)
         self._combo.grid(row=row, column=1, **options)
         self._button.grid(row=row, column=2, **options)
+        self._reload.grid(row=row, column=3, **options)
 
     def _button_clicked(self):
         if self._button['text'] == "Connect":
@@ -102,5 +285,17 @@ class InstrWidget:
                 self._combo['state'] = 'normal'
                 self._button['text'] = "Connect"
                 
+    def _refresh_clicked(self):
+        self._combo['values'] = ResourcePool.list_resources(refresh=True)
+        print(f"Refreshed VISA resources for {self._instrument.name}")
+
     def combo_set(self, value):
-        self._combo.set(value)
\ No newline at end of file
+        self._combo.set(value)
+
+    def enable(self):
+        self._button['state'] = 'normal'
+        self._reload['state'] = 'normal'
+
+    def disable(self):
+        self._button['state'] = 'disabled'
+        self._reload['state'] = 'disabled'
\ No newline at end of file
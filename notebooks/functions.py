@@ -1,3 +1,3 @@
 import sys
 if not '..' in sys.path: sys.path.append('..')
-from experiment import Data
\ No newline at end of file
+from experiment import Data, DataSet
\ No newline at end of file